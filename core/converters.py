@@ -0,0 +1,10 @@
+class SmallIntConverter:
+    # Ate 9 digitos e sem zero a esquerda: ids absurdos ou nao canonicos (0, 007)
+    # falham no regex, sem chegar ao int() nem ao banco.
+    regex = "[1-9][0-9]{0,8}"
+
+    def to_python(self, value):
+        return int(value)
+
+    def to_url(self, value):
+        return str(value)
@@ -1,9 +1,11 @@
 from datetime import timedelta
+from functools import cache
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.shortcuts import render
 from django.shortcuts import redirect
-from django.urls import reverse
+from django.urls import get_resolver
 from django.utils import timezone
 
 from .access_control import has_tipo_code
@@ -13,6 +15,14 @@ from .models import AdminAccessLog, PerfilUsuario, SystemConfiguration
 ADMIN_PRIVILEGED_TIPOS = {"MASTER", "DEV"}
 
 
+@cache
+def _maintenance_allowed_paths(urlconf):
+    # Um reverse() por URLconf, em vez de dois a cada requisicao. Sem o script prefix
+    # (SCRIPT_NAME), para comparar com request.path_info em qualquer sub-path de deploy.
+    resolver = get_resolver(urlconf)
+    return frozenset({"/" + resolver.reverse("maintenance"), "/" + resolver.reverse("logout")})
+
+
 class MaintenanceModeMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -23,7 +33,7 @@ class MaintenanceModeMiddleware:
         return self.get_response(request)
 
     def _should_redirect_to_maintenance(self, request):
-        if self._is_allowed_path(request.path or ""):
+        if self._is_allowed_path(request.path_info or "", getattr(request, "urlconf", None)):
             return False
         user = getattr(request, "user", None)
         if not user or not user.is_authenticated:
@@ -36,15 +46,11 @@ class MaintenanceModeMiddleware:
             return False
         return bool(config.maintenance_mode_enabled)
 
-    def _is_allowed_path(self, path):
+    def _is_allowed_path(self, path, urlconf=None):
         allowed_prefixes = ("/static/", "/media/", "/admin/static/")
         if path.startswith(allowed_prefixes):
             return True
-        allowed_paths = {
-            reverse("maintenance"),
-            reverse("logout"),
-        }
-        return path in allowed_paths
+        return path in _maintenance_allowed_paths(urlconf or settings.ROOT_URLCONF)
 
 
 class AdminAccessLogMiddleware:
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0094_proposta_valor_com_desconto"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="compra",
+            index=models.Index(fields=["caderno", "-data"], name="core_compra_caderno_d6d3da_idx"),
+        ),
+    ]
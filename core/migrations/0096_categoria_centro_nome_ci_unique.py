@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def merge_case_insensitive_duplicates(apps, schema_editor):
+    Compra = apps.get_model("core", "Compra")
+    for model_name, compra_field in (("CategoriaCompra", "categoria"), ("CentroCusto", "centro_custo")):
+        Model = apps.get_model("core", model_name)
+        keepers = {}
+        duplicates = {}
+        for obj_id, nome in Model.objects.order_by("id").values_list("id", "nome"):
+            key = (nome or "").lower()
+            if key in keepers:
+                duplicates[obj_id] = keepers[key]
+            else:
+                keepers[key] = obj_id
+        for duplicate_id, keeper_id in duplicates.items():
+            Compra.objects.filter(**{f"{compra_field}_id": duplicate_id}).update(**{f"{compra_field}_id": keeper_id})
+        if duplicates:
+            Model.objects.filter(id__in=list(duplicates)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0095_compra_caderno_data_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_insensitive_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="categoriacompra",
+            constraint=models.UniqueConstraint(Lower("nome"), name="categoriacompra_nome_ci_uniq"),
+        ),
+        migrations.AddConstraint(
+            model_name="centrocusto",
+            constraint=models.UniqueConstraint(Lower("nome"), name="centrocusto_nome_ci_uniq"),
+        ),
+    ]
@@ -6,6 +6,7 @@ from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.db import models
 from django.db.models import Max
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 
@@ -523,6 +524,11 @@ class AppMilhaoBlaMuralDiaLeitura(models.Model):
 class CategoriaCompra(models.Model):
     nome = models.CharField(max_length=80, unique=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower("nome"), name="categoriacompra_nome_ci_uniq"),
+        ]
+
     def __str__(self):
         return self.nome
 
@@ -537,6 +543,11 @@ class TipoCompra(models.Model):
 class CentroCusto(models.Model):
     nome = models.CharField(max_length=80, unique=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower("nome"), name="centrocusto_nome_ci_uniq"),
+        ]
+
     def __str__(self):
         return self.nome
 
@@ -560,6 +571,11 @@ class Compra(models.Model):
     anexo_foto = models.ImageField(upload_to="financeiro/compras/", blank=True, null=True)
     criado_em = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["caderno", "-data"]),
+        ]
+
     def __str__(self):
         base = self.nome or self.descricao or "Compra"
         return f"{base} - {self.valor}"
@@ -0,0 +1,21 @@
+from .models import TipoPerfil
+
+
+def _request_ordered_list(request, model):
+    # Memoizado no request, como _cliente_financeiro_ids no perfil: uma consulta por
+    # request e nada compartilhado entre workers, entao a lista nunca fica velha.
+    option_lists = getattr(request, "_option_lists", None)
+    if option_lists is None:
+        option_lists = request._option_lists = {}
+    rows = option_lists.get(model)
+    if rows is None:
+        rows = option_lists[model] = list(model.objects.order_by("nome"))
+    return rows
+
+
+def tipos_perfil_options(request):
+    return _request_ordered_list(request, TipoPerfil)
+
+
+def financeiro_options(request, model):
+    return _request_ordered_list(request, model)
@@ -2,18 +2,20 @@ import json
 from io import BytesIO
 from pathlib import Path
 from unittest.mock import patch
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
 from django.contrib.auth.models import User
 from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, SimpleTestCase, TestCase
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.urls import Resolver404, resolve
 from django.utils import timezone
 from openpyxl import Workbook
 
 from core.apps.app_rotas.views import _global_point_visual_flags, _route_point_visual_flags
 from core.access_control import has_tipo_code, normalize_access_code
+from core.selectors import financeiro_options, tipos_perfil_options
 from core.models import (
     AcessoProdutoUsuario,
     AdminAccessLog,
@@ -34,7 +36,11 @@ from core.models import (
     IngestRecord,
     CanalRackIO,
     Caderno,
+    CategoriaCompra,
+    CentroCusto,
     Compra,
+    CompraItem,
+    FinanceiroID,
     LocalRackIO,
     ModuloAcesso,
     ModuloIO,
@@ -54,6 +60,7 @@ from core.models import (
     RadarTrabalhoObservacao,
     RackSlotIO,
     SystemConfiguration,
+    TipoAtivo,
     TipoCanalIO,
     TipoPerfil,
 )
@@ -86,6 +93,11 @@ from core.views import (
     DOCUMENTACAO_TECNICA_LANDING_AUDIT_MODULE,
     _build_proposta_pdf_context,
     _build_radar_relatorio_pdf_context,
+    _financeiro_allowed_cadernos_qs,
+    _get_cliente,
+    _normalize_parcela,
+    _parcela_for_copy,
+    _parse_codes,
     _reprocess_ip_import_job,
     _sanitize_proposta_descricao,
     _user_role,
@@ -118,6 +130,22 @@ class AccessControlFoundationTests(TestCase):
         self.assertEqual(normalize_access_code("acl teste"), "ACL_TESTE")
         self.assertTrue(has_tipo_code(user, "acl teste"))
 
+    def test_get_cliente_memoizes_email_fallback_on_user(self):
+        legado = User.objects.create_user(username="legado@set.local", email="legado@set.local", password="123456")
+        perfil = PerfilUsuario.objects.create(nome="Fallback", email="fallback@set.local", usuario=legado)
+        user = User.objects.create_user(username="fallback@set.local", email="fallback@set.local", password="123456")
+        self.assertEqual(_get_cliente(user), perfil)
+        with self.assertNumQueries(0):
+            self.assertEqual(_get_cliente(user), perfil)
+
+    def test_tipos_perfil_options_memoized_per_request(self):
+        request = RequestFactory().get("/usuarios/")
+        tipos_perfil_options(request)
+        with self.assertNumQueries(0):
+            tipos_perfil_options(request)
+        tipo = TipoPerfil.objects.create(nome="Cache Piloto")
+        self.assertIn(tipo, tipos_perfil_options(RequestFactory().get("/usuarios/")))
+
 
 class AccessControlAdminAndVisibilityTests(TestCase):
     def setUp(self):
@@ -406,6 +434,38 @@ class DevAdminPrivilegesTests(TestCase):
         response = self.client_http.get("/admin-logs/")
         self.assertEqual(response.status_code, 200)
 
+    def test_admin_explorar_annotates_proposta_counts(self):
+        Proposta.objects.create(cliente=self.perfil, nome="Proposta A", descricao="A")
+        Proposta.objects.create(cliente=self.perfil, nome="Proposta B", descricao="B")
+        self.client_http.force_login(self.dev_user)
+
+        response = self.client_http.get("/admin/explorar/", {"cliente_id": self.perfil.pk})
+
+        self.assertEqual(response.status_code, 200)
+        totals = {c.pk: c.propostas_total for c in response.context["clientes"]}
+        self.assertEqual(totals[self.perfil.pk], 2)
+        self.assertEqual(len(response.context["propostas"]), 2)
+
+    def test_admin_explorar_redirects_non_admin_to_admin_login(self):
+        self.client_http.force_login(self.user)
+
+        response = self.client_http.get("/admin/explorar/")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/admin/login/", response["Location"])
+
+    def test_ajustes_toggle_tipo_ativo_flips_flag(self):
+        tipo = TipoAtivo.objects.create(nome="Painel", codigo="PNL", ativo=True)
+        self.client_http.force_login(self.dev_user)
+
+        self.client_http.post("/ajustes/", {"action": "toggle_tipo_ativo", "tipo_id": tipo.pk})
+        tipo.refresh_from_db()
+        self.assertFalse(tipo.ativo)
+
+        self.client_http.post("/ajustes/", {"action": "toggle_tipo_ativo", "tipo_id": tipo.pk})
+        tipo.refresh_from_db()
+        self.assertTrue(tipo.ativo)
+
     def test_documentacao_landing_records_anonymous_access(self):
         response = self.client_http.get("/produtos/documentacao-tecnica/")
         self.assertEqual(response.status_code, 200)
@@ -437,11 +497,127 @@ class DevAdminPrivilegesTests(TestCase):
         self.dev_user.refresh_from_db()
         self.assertTrue(self.dev_user.is_staff)
 
+    def test_user_detail_page_is_get_only_and_shows_redirect_message(self):
+        self.client_http.force_login(self.dev_user)
+        response = self.client_http.post(f"/usuarios/{self.user.pk}/", {"action": "update_user"})
+        self.assertEqual(response.status_code, 405)
+
+        response = self.client_http.post(f"/usuarios/{self.user.pk}/senha/", {"new_password": ""})
+        self.assertRedirects(
+            response,
+            f"/usuarios/{self.user.pk}/?msg=Informe+uma+senha+valida.",
+            fetch_redirect_response=False,
+        )
+        response = self.client_http.get(response["Location"])
+        self.assertContains(response, "Informe uma senha valida.")
+
+    def test_non_dev_cannot_update_user_through_narrow_endpoints(self):
+        self.client_http.force_login(self.user)
+        for suffix in ("email", "perfil", "senha"):
+            response = self.client_http.post(f"/usuarios/{self.dev_user.pk}/{suffix}/", {})
+            self.assertEqual(response.status_code, 403)
+
     def test_non_dev_cannot_access_admin_logs(self):
         self.client_http.force_login(self.user)
         response = self.client_http.get("/admin-logs/")
         self.assertEqual(response.status_code, 403)
 
+    def test_dev_updates_perfil_scopes_and_skips_unchanged_resubmission(self):
+        self.client_http.force_login(self.dev_user)
+        payload = {
+            "nome": "Regular User",
+            "empresa": "SET",
+            "sigla_cidade": "POA",
+            "tipos": [str(self.tipo_cliente.pk), str(self.tipo_dev.pk), "999999"],
+            "plantas": "p1; p2, P1",
+            "financeiros": "fin1",
+            "apps": "appmilhaobla, AppMilhaoBla",
+        }
+        response = self.client_http.post(f"/usuarios/{self.user.pk}/perfil/", payload)
+        self.assertEqual(response.status_code, 302)
+        self.perfil.refresh_from_db()
+        self.assertEqual(self.perfil.empresa, "SET")
+        self.assertEqual(set(self.perfil.tipos.all()), {self.tipo_cliente, self.tipo_dev})
+        self.assertEqual(sorted(self.perfil.plantas.values_list("codigo", flat=True)), ["P1", "P2"])
+        self.assertEqual(list(self.perfil.financeiros.values_list("codigo", flat=True)), ["FIN1"])
+        self.assertEqual(list(self.perfil.apps.values_list("slug", flat=True)), ["appmilhaobla"])
+
+        with patch("core.views._upsert_codes") as upsert_codes:
+            response = self.client_http.post(f"/usuarios/{self.user.pk}/perfil/", payload)
+        self.assertEqual(response.status_code, 302)
+        upsert_codes.assert_not_called()
+        self.assertEqual(sorted(self.perfil.plantas.values_list("codigo", flat=True)), ["P1", "P2"])
+
+    def test_dev_updates_user_email_and_perfil_email(self):
+        self.client_http.force_login(self.dev_user)
+        response = self.client_http.post(
+            f"/usuarios/{self.user.pk}/email/",
+            {"email": "Novo@Set.Local", "is_active": "on"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.user.refresh_from_db()
+        self.perfil.refresh_from_db()
+        self.assertEqual(self.user.username, "novo@set.local")
+        self.assertEqual(self.user.email, "novo@set.local")
+        self.assertFalse(self.user.is_staff)
+        self.assertTrue(self.user.is_active)
+        self.assertEqual(self.perfil.email, "novo@set.local")
+
+    def test_dev_sets_user_password(self):
+        self.client_http.force_login(self.dev_user)
+
+        response = self.client_http.post(f"/usuarios/{self.user.pk}/senha/", {"new_password": "nova-senha"})
+
+        self.assertEqual(response.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("nova-senha"))
+
+    def test_meu_perfil_redirects_anonymous_to_login(self):
+        response = self.client_http.get("/meu-perfil/")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response["Location"].startswith("/login/"))
+
+
+class PerfilCodeParsingTests(SimpleTestCase):
+    def test_parse_codes_normalizes_separators_and_drops_duplicates(self):
+        self.assertEqual(_parse_codes("a, b;\nA\tc,, b"), ["A", "B", "C"])
+
+    def test_parse_codes_handles_empty_input(self):
+        self.assertEqual(_parse_codes(""), [])
+        self.assertEqual(_parse_codes(None), [])
+
+
+class ParcelaParsingTests(SimpleTestCase):
+    def test_normalize_parcela_pads_and_rejects_invalid_values(self):
+        self.assertEqual(_normalize_parcela(" 2/5 ", "1/1"), "02/05")
+        self.assertEqual(_normalize_parcela("1/-", "1/1"), "1/-")
+        self.assertEqual(_normalize_parcela("0/3", "1/1"), "1/1")
+        self.assertEqual(_normalize_parcela("2/x", "1/1"), "1/1")
+
+    def test_parcela_for_copy_advances_until_last_installment(self):
+        self.assertEqual(_parcela_for_copy("01/03", 2), "03/03")
+        self.assertIsNone(_parcela_for_copy("01/03", 3))
+        self.assertIsNone(_parcela_for_copy("1/1", 1))
+        self.assertEqual(_parcela_for_copy("1/-", 5), "1/-")
+        self.assertEqual(_parcela_for_copy("avulsa", 2), "avulsa")
+
+
+class UrlConverterTests(SimpleTestCase):
+    def test_pk_converter_rejects_oversized_and_zero_padded_ids(self):
+        self.assertEqual(resolve("/propostas/123456789/").kwargs, {"pk": 123456789})
+        for path in ("/propostas/1234567890/", "/propostas/0/", "/propostas/007/"):
+            with self.subTest(path=path), self.assertRaises(Resolver404):
+                resolve(path)
+
+
+class LoginViewTests(TestCase):
+    def test_login_page_uses_project_template(self):
+        response = Client().get("/login/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "core/login.html")
+
 
 class ForbiddenPagePresentationTests(TestCase):
     def setUp(self):
@@ -541,6 +717,14 @@ class MaintenanceModeTests(TestCase):
         response = self.client_http.post("/logout/")
         self.assertEqual(response.status_code, 302)
 
+    def test_maintenance_page_allowed_under_script_prefix(self):
+        self.client_http.force_login(self.user)
+        self.assertEqual(self.client_http.get("/manutencao/").status_code, 200)
+
+        response = self.client_http.get("/manutencao/", SCRIPT_NAME="/sub")
+
+        self.assertEqual(response.status_code, 200)
+
 
 class RouteTimelineStateTests(SimpleTestCase):
     def _timeline_points(self, start, count, step_minutes=5):
@@ -4010,3 +4194,311 @@ class FinanceiroCompraAnexoFotoTests(TestCase):
 
         compra.refresh_from_db()
         self.assertFalse(bool(compra.anexo_foto))
+
+
+class FinanceiroDetailViewsTests(TestCase):
+    def setUp(self):
+        self.tipo_financeiro = TipoPerfil.objects.get(codigo="FINANCEIRO")
+        ModuloAcesso.objects.get(codigo="FINANCEIRO").tipos.set([self.tipo_financeiro])
+
+        self.user = User.objects.create_user(
+            username="financeiro-caderno@set.local",
+            email="financeiro-caderno@set.local",
+            password="123456",
+        )
+        self.perfil = PerfilUsuario.objects.create(
+            nome="Financeiro Caderno",
+            email="financeiro-caderno@set.local",
+            usuario=self.user,
+        )
+        self.perfil.tipos.add(self.tipo_financeiro)
+        self.caderno = Caderno.objects.create(nome="Caderno Mensal", criador=self.perfil, ativo=True)
+        self.client.force_login(self.user)
+
+    def _get_month_snapshot(self, mes):
+        return self.client.get(
+            f"/financeiro/cadernos/{self.caderno.pk}/",
+            {"mes": mes},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        ).json()
+
+    def test_overview_total_mes_only_counts_current_month(self):
+        today = timezone.localdate()
+        atual = Compra.objects.create(caderno=self.caderno, nome="Atual", data=today.replace(day=1))
+        CompraItem.objects.create(compra=atual, nome="A", valor=Decimal("4.00"), quantidade=2)
+        antiga = Compra.objects.create(caderno=self.caderno, nome="Antiga", data=today.replace(day=1) - timedelta(days=1))
+        CompraItem.objects.create(compra=antiga, nome="B", valor=Decimal("100.00"), quantidade=1)
+
+        response = self.client.get("/financeiro/")
+
+        self.assertEqual(response.status_code, 200)
+        cadernos = {caderno.pk: caderno for caderno in response.context["cadernos"]}
+        self.assertEqual(cadernos[self.caderno.pk].total_mes, Decimal("8.00"))
+        self.assertEqual(response.context["total_geral"], Decimal("108.00"))
+
+    def test_month_navigation_wraps_year_boundaries(self):
+        payload = self._get_month_snapshot("2025-12")
+        self.assertEqual(payload["selected_month"], "2025-12")
+        self.assertEqual(payload["prev_month"], "2025-11")
+        self.assertEqual(payload["next_month"], "2026-01")
+
+        payload = self._get_month_snapshot("2026-01")
+        self.assertEqual(payload["prev_month"], "2025-12")
+        self.assertEqual(payload["next_month"], "2026-02")
+
+    def test_month_snapshot_only_includes_compras_inside_selected_month(self):
+        Compra.objects.create(caderno=self.caderno, nome="Ultimo dia", data=date(2026, 2, 28))
+        Compra.objects.create(caderno=self.caderno, nome="Mes seguinte", data=date(2026, 3, 1))
+
+        payload = self._get_month_snapshot("2026-02")
+
+        self.assertEqual([row["nome"] for row in payload["rows"]], ["Ultimo dia"])
+
+    def test_invalid_month_falls_back_to_current_month(self):
+        payload = self._get_month_snapshot("2026-13")
+        self.assertEqual(payload["selected_month"], timezone.localdate().strftime("%Y-%m"))
+
+    def test_compra_detail_annotates_item_totals(self):
+        compra = Compra.objects.create(caderno=self.caderno, nome="Compra itens", data=date(2026, 2, 10))
+        CompraItem.objects.create(compra=compra, nome="Cabo", valor=Decimal("12.50"), quantidade=2, pago=True)
+        CompraItem.objects.create(compra=compra, nome="Sem valor", valor=None, quantidade=3, pago=True)
+
+        response = self.client.get(f"/financeiro/compras/{compra.pk}/")
+
+        self.assertEqual(response.status_code, 200)
+        itens = response.context["itens"]
+        self.assertEqual([item.total_valor for item in itens], [Decimal("25.00"), Decimal("0.00")])
+        self.assertEqual(response.context["compra"].total_itens, Decimal("25.00"))
+        self.assertEqual(response.context["compra"].status_label, "Pago")
+
+    def test_financeiro_options_memoized_per_request(self):
+        request = RequestFactory().get("/financeiro/nova/")
+        financeiro_options(request, CentroCusto)
+        with self.assertNumQueries(0):
+            financeiro_options(request, CentroCusto)
+        centro = CentroCusto.objects.create(nome="Manutencao")
+        self.assertIn(centro, financeiro_options(RequestFactory().get("/financeiro/nova/"), CentroCusto))
+
+    def test_create_categoria_reuses_existing_name_ignoring_case(self):
+        categoria = CategoriaCompra.objects.create(nome="Material Eletrico")
+
+        response = self.client.post(
+            "/financeiro/nova/",
+            {"action": "create_categoria", "categoria_nome": "  material eletrico "},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        payload = response.json()
+        self.assertFalse(payload["created"])
+        self.assertEqual(payload["id"], categoria.id)
+        self.assertEqual(CategoriaCompra.objects.count(), 1)
+
+    def test_copy_next_months_updates_existing_copies_and_creates_missing_ones(self):
+        compra = Compra.objects.create(caderno=self.caderno, nome="Licenca", data=date(2026, 1, 31))
+        CompraItem.objects.create(compra=compra, nome="Parcela", valor=Decimal("100.00"), quantidade=1, parcela="01/03")
+        CompraItem.objects.create(compra=compra, nome="Assinatura", valor=Decimal("10.00"), quantidade=1, parcela="1/-")
+        existing = Compra.objects.create(caderno=self.caderno, nome="Licenca", data=date(2026, 2, 28))
+        CompraItem.objects.create(compra=existing, nome="Antigo", valor=Decimal("1.00"), quantidade=1)
+
+        response = self.client.post(
+            f"/financeiro/compras/{compra.pk}/",
+            {"action": "copy_next_months", "meses": "3"},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        copias = Compra.objects.filter(nome="Licenca").exclude(pk=compra.pk).order_by("data")
+        self.assertEqual([copia.data for copia in copias], [date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)])
+        self.assertEqual(copias[0].pk, existing.pk)
+        itens_por_data = {
+            copia.data: sorted(copia.itens.values_list("nome", "parcela")) for copia in copias
+        }
+        self.assertEqual(itens_por_data[date(2026, 2, 28)], [("Assinatura", "1/-"), ("Parcela", "02/03")])
+        self.assertEqual(itens_por_data[date(2026, 3, 31)], [("Assinatura", "1/-"), ("Parcela", "03/03")])
+        self.assertEqual(itens_por_data[date(2026, 4, 30)], [("Assinatura", "1/-")])
+
+    def test_update_compra_ignores_caderno_outside_allowed_set(self):
+        outro_perfil = PerfilUsuario.objects.create(
+            nome="Outro",
+            email="outro-financeiro@set.local",
+            usuario=User.objects.create_user(username="outro-financeiro@set.local", password="123456"),
+        )
+        caderno_alheio = Caderno.objects.create(nome="Alheio", criador=outro_perfil, ativo=True)
+        outro_caderno = Caderno.objects.create(nome="Segundo", criador=self.perfil, ativo=True)
+        compra = Compra.objects.create(caderno=self.caderno, nome="Compra", data=date(2026, 2, 10))
+
+        self.client.post(
+            f"/financeiro/compras/{compra.pk}/",
+            {"action": "update_compra", "nome": "Movida", "caderno": str(caderno_alheio.pk)},
+        )
+        compra.refresh_from_db()
+        self.assertEqual((compra.nome, compra.caderno_id), ("Compra", self.caderno.pk))
+
+        with patch(
+            "core.views._financeiro_allowed_cadernos_qs", wraps=_financeiro_allowed_cadernos_qs
+        ) as allowed_cadernos_qs:
+            self.client.post(
+                f"/financeiro/compras/{compra.pk}/",
+                {"action": "update_compra", "nome": "Movida", "caderno": str(outro_caderno.pk)},
+            )
+        compra.refresh_from_db()
+        self.assertEqual((compra.nome, compra.caderno_id), ("Movida", outro_caderno.pk))
+        allowed_cadernos_qs.assert_called_once()
+
+    def test_toggle_item_pago_returns_row_and_summary(self):
+        compra = Compra.objects.create(caderno=self.caderno, nome="Compra", data=date(2026, 2, 10))
+        item = CompraItem.objects.create(compra=compra, nome="Cabo", valor=Decimal("5.00"), quantidade=2)
+
+        payload = self.client.post(
+            f"/financeiro/compras/{compra.pk}/",
+            {"action": "toggle_item_pago", "item_id": item.pk},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        ).json()
+
+        self.assertEqual(payload["row"]["pago_status"], "pago")
+        self.assertEqual(payload["compra"]["total_pago"], "10.00")
+        self.assertEqual(payload["compra"]["status_label"], "Pago")
+
+    def test_unknown_action_renders_compra_detail(self):
+        compra = Compra.objects.create(caderno=self.caderno, nome="Compra", data=date(2026, 2, 10))
+
+        response = self.client.post(f"/financeiro/compras/{compra.pk}/", {"action": "inexistente"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["compra"].pk, compra.pk)
+
+    def test_month_snapshot_totals_are_computed_per_compra(self):
+        paga = Compra.objects.create(caderno=self.caderno, nome="Paga", data=date(2026, 2, 3))
+        CompraItem.objects.create(compra=paga, nome="A", valor=Decimal("10.00"), quantidade=3, pago=True)
+        parcial = Compra.objects.create(caderno=self.caderno, nome="Parcial", data=date(2026, 2, 4))
+        CompraItem.objects.create(compra=parcial, nome="B", valor=Decimal("5.00"), quantidade=1, pago=True)
+        CompraItem.objects.create(compra=parcial, nome="C", valor=None, quantidade=2, pago=False)
+        CompraItem.objects.create(compra=parcial, nome="D", valor=Decimal("2.50"), quantidade=2, pago=False)
+        Compra.objects.create(caderno=self.caderno, nome="Vazia", data=date(2026, 2, 5))
+
+        payload = self._get_month_snapshot("2026-02")
+
+        rows = {row["nome"]: row for row in payload["rows"]}
+        self.assertEqual(rows["Paga"]["detalhe_url"], f"/financeiro/compras/{paga.pk}/")
+        self.assertEqual((rows["Paga"]["status"], rows["Paga"]["total_itens"]), ("pago", "30.00"))
+        self.assertEqual(
+            (rows["Parcial"]["status"], rows["Parcial"]["total_pago"], rows["Parcial"]["total_pendente"]),
+            ("pendente", "5.00", "5.00"),
+        )
+        self.assertEqual((rows["Vazia"]["status"], rows["Vazia"]["itens_count"]), ("pendente", 0))
+        self.assertEqual(payload["summary"]["total_mes"], "40.00")
+        self.assertEqual(payload["summary"]["total_pendente"], "5.00")
+
+        resumo = self.client.get(f"/financeiro/cadernos/{self.caderno.pk}/", {"mes": "2026-02"}).context["resumo"]
+        self.assertEqual(
+            (resumo["total_compras"], resumo["total_pagas"], resumo["total_pendentes"]),
+            (3, 1, 2),
+        )
+        self.assertEqual(resumo["total_mes"], Decimal("40.00"))
+
+    def test_quick_compra_returns_month_summary(self):
+        existente = Compra.objects.create(caderno=self.caderno, nome="Existente", data=date(2026, 2, 3))
+        CompraItem.objects.create(compra=existente, nome="A", valor=Decimal("10.00"), quantidade=2, pago=True)
+
+        payload = self.client.post(
+            f"/financeiro/cadernos/{self.caderno.pk}/?mes=2026-02",
+            {
+                "action": "create_quick_compra",
+                "nome": "Rapida",
+                "data": "2026-02-10",
+                "item_nome": "Item",
+                "item_valor": "7,50",
+            },
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        ).json()
+
+        self.assertEqual(payload["row"]["total_itens"], "7.50")
+        self.assertEqual(
+            payload["summary"],
+            {"total_mes": "27.50", "total_pago": "20.00", "total_pendente": "7.50", "total_compras": 2},
+        )
+
+    def test_compra_detail_hides_compras_from_other_cadernos(self):
+        outro_perfil = PerfilUsuario.objects.create(
+            nome="Outro",
+            email="outro-detalhe@set.local",
+            usuario=User.objects.create_user(username="outro-detalhe@set.local", password="123456"),
+        )
+        caderno_alheio = Caderno.objects.create(nome="Alheio", criador=outro_perfil, ativo=True)
+        alheia = Compra.objects.create(caderno=caderno_alheio, nome="Alheia")
+        sem_caderno = Compra.objects.create(nome="Sem caderno")
+
+        self.assertEqual(self.client.get(f"/financeiro/compras/{alheia.pk}/").status_code, 404)
+        self.assertEqual(self.client.get(f"/financeiro/compras/{sem_caderno.pk}/").status_code, 404)
+        self.assertEqual(self.client.get("/financeiro/compras/999999/").status_code, 404)
+
+    def test_create_categoria_without_name_returns_empty_payload(self):
+        compra = Compra.objects.create(caderno=self.caderno, nome="Compra")
+
+        payload = self.client.post(
+            f"/financeiro/compras/{compra.pk}/",
+            {"action": "create_categoria", "categoria_nome": "  "},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        ).json()
+
+        self.assertEqual((payload["ok"], payload["id"], payload["level"]), (False, None, "error"))
+
+    def test_copy_next_months_reuses_matching_items_of_existing_copy(self):
+        compra = Compra.objects.create(caderno=self.caderno, nome="Licenca", data=date(2026, 1, 15))
+        CompraItem.objects.create(compra=compra, nome="Parcela", valor=Decimal("90.00"), quantidade=1, parcela="01/03")
+        existing = Compra.objects.create(caderno=self.caderno, nome="Licenca", data=date(2026, 2, 15))
+        mantido = CompraItem.objects.create(
+            compra=existing, nome="Parcela", valor=Decimal("1.00"), quantidade=1, parcela="02/03", pago=True
+        )
+        CompraItem.objects.create(compra=existing, nome="Antigo", valor=Decimal("1.00"), quantidade=1)
+
+        self.client.post(f"/financeiro/compras/{compra.pk}/", {"action": "copy_next_months", "meses": "1"})
+
+        itens = list(existing.itens.all())
+        self.assertEqual([item.pk for item in itens], [mantido.pk])
+        self.assertEqual((itens[0].valor, itens[0].pago), (Decimal("90.00"), False))
+
+    def test_update_item_valor_accepts_comma_and_rejects_non_finite_values(self):
+        compra = Compra.objects.create(caderno=self.caderno, nome="Compra")
+        item = CompraItem.objects.create(compra=compra, nome="Cabo", valor=Decimal("1.00"), quantidade=1)
+        url = f"/financeiro/compras/{compra.pk}/"
+
+        response = self.client.post(
+            url,
+            {"action": "update_item_valor", "item_id": item.pk, "valor": " 12,30 "},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        self.assertEqual(response.json()["row"]["valor"], "12.30")
+
+        response = self.client.post(
+            url,
+            {"action": "update_item_valor", "item_id": item.pk, "valor": "NaN"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        self.assertEqual(response.status_code, 400)
+        item.refresh_from_db()
+        self.assertEqual(item.valor, Decimal("12.30"))
+
+    def test_compras_sem_data_are_paginated(self):
+        Compra.objects.bulk_create(
+            [Compra(caderno=self.caderno, nome=f"Sem data {idx}") for idx in range(51)]
+        )
+
+        response = self.client.get(f"/financeiro/cadernos/{self.caderno.pk}/", {"page": 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["compras_sem_data"]), 1)
+        self.assertEqual(response.context["compras_sem_data_page"].paginator.count, 51)
+
+    def test_shared_financeiro_id_grants_access_to_caderno_compras(self):
+        financeiro = FinanceiroID.objects.create(codigo="FIN-COMPARTILHADO")
+        self.perfil.financeiros.add(financeiro)
+        dono = PerfilUsuario.objects.create(
+            nome="Dono",
+            email="dono-financeiro@set.local",
+            usuario=User.objects.create_user(username="dono-financeiro@set.local", password="123456"),
+        )
+        compartilhado = Caderno.objects.create(nome="Compartilhado", criador=dono, id_financeiro=financeiro)
+        compra = Compra.objects.create(caderno=compartilhado, nome="Compartilhada")
+
+        self.assertEqual(self.client.get(f"/financeiro/compras/{compra.pk}/").status_code, 200)
+        self.assertEqual(self.client.get(f"/financeiro/cadernos/{compartilhado.pk}/").status_code, 200)
@@ -13,10 +13,12 @@ from datetime import date, datetime, timedelta
 from decimal import Decimal, InvalidOperation
 
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import views as auth_views
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
 from django.core.paginator import Paginator
-from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -26,13 +28,15 @@ from django.utils import timezone
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import never_cache
 from django.utils import timezone
 
 from django.contrib.auth.models import User
-from django.db import DatabaseError, connections, transaction
-from django.db.models import Case, Count, DecimalField, F, IntegerField, Max, Min, OuterRef, Q, Subquery, Sum, TextField, Value, When
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Max, Min, OuterRef, Prefetch, Q, Subquery, Sum, TextField, Value, When
+from django.db.models import prefetch_related_objects
 from django.db.models.expressions import ExpressionWrapper
-from django.db.models.functions import Cast, Coalesce
+from django.db.models.functions import Cast, Coalesce, Lower
 
 from .forms import RegisterForm, TipoPerfilCreateForm, UserCreateForm
 from .models import (
@@ -133,6 +137,7 @@ from .access_control import (
     user_has_product_access,
     visible_internal_module_codes,
 )
+from .selectors import financeiro_options, tipos_perfil_options
 
 logger = logging.getLogger(__name__)
 ADMIN_PRIVILEGED_TIPOS = {"MASTER", "DEV"}
@@ -447,10 +452,15 @@ def _get_cliente(user):
     try:
         return user.perfilusuario
     except PerfilUsuario.DoesNotExist:
-        email = (user.email or user.username or "").strip().lower()
-        if not email:
-            return None
-        return PerfilUsuario.objects.filter(email__iexact=email).first()
+        pass
+    # O acesso reverso acima ja fica em cache no proprio usuario; o fallback por
+    # email e memorizado da mesma forma para durar apenas o ciclo do request.
+    if hasattr(user, "_cliente_por_email"):
+        return user._cliente_por_email
+    email = (user.email or user.username or "").strip().lower()
+    cliente = PerfilUsuario.objects.filter(email__iexact=email).first() if email else None
+    user._cliente_por_email = cliente
+    return cliente
 
 
 def _cliente_has_admin_privileges(cliente):
@@ -691,6 +701,47 @@ def _build_product_access_rows(user):
     return rows
 
 
+def _split_codes(raw):
+    cleaned = raw or ""
+    for sep in [";", "\n", "\r", "\t"]:
+        cleaned = cleaned.replace(sep, ",")
+    return [code.strip() for code in cleaned.split(",") if code.strip()]
+
+
+def _parse_codes(raw):
+    return list(dict.fromkeys(code.upper() for code in _split_codes(raw)))
+
+
+def _upsert_codes(model, codes):
+    codes = list(dict.fromkeys(codes))
+    if not codes:
+        return {}
+    connection = connections["default"]
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (codigo)
+                SELECT unnest(%s::text[])
+                ON CONFLICT (codigo) DO UPDATE SET codigo = EXCLUDED.codigo
+                RETURNING id, codigo
+                """,
+                [codes],
+            )
+            return {codigo: pk for pk, codigo in cursor.fetchall()}
+    model.objects.bulk_create([model(codigo=code) for code in codes], ignore_conflicts=True)
+    return dict(model.objects.filter(codigo__in=codes).values_list("codigo", "id"))
+
+
+def _sync_perfil_codes(manager, model, codes):
+    # Reenvio do mesmo formulario nao deve recriar vinculos nem consultar cada codigo.
+    if set(codes) == set(manager.values_list("codigo", flat=True)):
+        return
+    code_ids = _upsert_codes(model, codes)
+    manager.set([code_ids[code] for code in codes])
+
+
 def _require_internal_module_access(request, module_code):
     product_code = resolve_commercial_product_code(module_code)
     if product_code:
@@ -789,14 +840,45 @@ def _ensure_default_cadernos(cliente):
         Caderno.objects.create(nome="OPEX", ativo=True, criador=cliente)
 
 
+def _cliente_financeiro_ids(cliente):
+    # Memoizado no perfil: as consultas do financeiro usam a lista literal em vez de uma subquery no M2M.
+    financeiro_ids = getattr(cliente, "_financeiro_ids", None)
+    if financeiro_ids is None:
+        financeiro_ids = list(cliente.financeiros.values_list("id", flat=True))
+        cliente._financeiro_ids = financeiro_ids
+    return financeiro_ids
+
+
 def _financeiro_allowed_cadernos_qs(user, cliente):
     if _is_admin_user(user) and not cliente:
         return Caderno.objects.all()
     if not cliente:
         return Caderno.objects.none()
-    return Caderno.objects.filter(
-        Q(criador=cliente) | Q(id_financeiro__in=cliente.financeiros.all())
-    ).distinct()
+    return Caderno.objects.filter(Q(criador=cliente) | Q(id_financeiro__in=_cliente_financeiro_ids(cliente)))
+
+
+def _financeiro_allowed_caderno_ids(user, cliente):
+    # Ids como string para comparar direto com o valor vindo do POST; memoizado no
+    # perfil, como _cliente_financeiro_ids, para uma unica consulta por request.
+    caderno_ids = getattr(cliente, "_financeiro_caderno_ids", None)
+    if caderno_ids is None:
+        caderno_ids = {
+            str(caderno_id)
+            for caderno_id in _financeiro_allowed_cadernos_qs(user, cliente).values_list("id", flat=True)
+        }
+        if cliente is not None:
+            cliente._financeiro_caderno_ids = caderno_ids
+    return caderno_ids
+
+
+def _financeiro_get_compra_or_404(user, cliente, pk):
+    # Busca pela PK e confere o caderno depois, sem o JOIN de _financeiro_allowed_compras_qs.
+    compra = get_object_or_404(Compra, pk=pk)
+    if _is_admin_user(user) and not cliente:
+        return compra
+    if not compra.caderno_id or str(compra.caderno_id) not in _financeiro_allowed_caderno_ids(user, cliente):
+        raise Http404("Compra nao encontrada.")
+    return compra
 
 
 def _financeiro_allowed_compras_qs(user, cliente):
@@ -805,8 +887,21 @@ def _financeiro_allowed_compras_qs(user, cliente):
     if not cliente:
         return Compra.objects.none()
     return Compra.objects.filter(
-        Q(caderno__criador=cliente) | Q(caderno__id_financeiro__in=cliente.financeiros.all())
-    ).distinct()
+        Q(caderno__criador=cliente) | Q(caderno__id_financeiro__in=_cliente_financeiro_ids(cliente))
+    )
+
+
+def _get_or_create_by_nome(model, nome):
+    # Usa a mesma expressao LOWER(nome) da constraint unica para aproveitar o indice.
+    lookup = model.objects.alias(nome_lower=Lower("nome")).filter(nome_lower=Lower(Value(nome)))
+    existing = lookup.first()
+    if existing:
+        return existing, False
+    try:
+        with transaction.atomic():
+            return model.objects.create(nome=nome), True
+    except IntegrityError:
+        return lookup.get(), False
 
 
 def _compra_status_label(compra):
@@ -825,20 +920,36 @@ def _add_months(base_date, months):
     return date(year, month, day)
 
 
+def _month_bounds(year, month):
+    start_date = date(year, month, 1)
+    return start_date, _add_months(start_date, 1), _add_months(start_date, -1)
+
+
+def _parse_valor(raw):
+    # Aceita virgula decimal; vazio vira None e texto invalido/NaN levanta InvalidOperation.
+    raw = (raw or "").replace(",", ".").strip()
+    if not raw:
+        return None
+    valor = Decimal(raw)
+    if not valor.is_finite():
+        raise InvalidOperation(raw)
+    return valor
+
+
+PARCELA_RE = re.compile(r"(?P<num>\d{1,5})/(?P<den>\d{1,5})", re.ASCII)
+
+
 def _parse_parcela(value):
     value = (value or "").strip()
     if not value:
         return None
     if value == "1/-":
         return ("recorrente", None, None)
-    if not re.match(r"^\d{1,5}/\d{1,5}$", value):
-        return None
-    num_str, den_str = value.split("/")
-    try:
-        num = int(num_str)
-        den = int(den_str)
-    except ValueError:
+    match = PARCELA_RE.fullmatch(value)
+    if not match:
         return None
+    num = int(match["num"])
+    den = int(match["den"])
     if num < 1 or den < 1:
         return None
     return ("parcelado", num, den)
@@ -850,21 +961,32 @@ def _format_parcela(num, den):
     return f"{num_str}/{den_str}"
 
 
-def _parcela_for_copy(value, offset):
+def _parcela_copy_base(value):
+    # (parcela_fixa, numero, total): recorrentes e textos livres sao copiados sem mudar.
     parsed = _parse_parcela(value)
     if not parsed:
-        return value
+        return (value, None, None)
     kind, num, den = parsed
     if kind == "recorrente":
-        return "1/-"
-    if num == 1 and den == 1:
-        return None
+        return ("1/-", None, None)
+    return (None, num, den)
+
+
+def _shift_parcela(base, offset):
+    # Recebe o retorno de _parcela_copy_base; None quando a parcela ja terminou.
+    parcela_fixa, num, den = base
+    if num is None:
+        return parcela_fixa
     new_num = num + offset
     if new_num > den:
         return None
     return _format_parcela(new_num, den)
 
 
+def _parcela_for_copy(value, offset):
+    return _shift_parcela(_parcela_copy_base(value), offset)
+
+
 def _normalize_parcela(value, fallback):
     parsed = _parse_parcela(value)
     if not parsed:
@@ -3005,6 +3127,11 @@ def colaboradores_gerenciar(request):
     )
 
 
+class LoginView(auth_views.LoginView):
+    # Template como atributo de classe: dispensa o initkwargs do as_view() a cada request.
+    template_name = "core/login.html"
+
+
 def register(request):
     if request.user.is_authenticated:
         return redirect(_get_safe_next_url(request))
@@ -8808,173 +8935,36 @@ def user_management(request):
             "form": form,
             "users": users,
             "user_query": user_query,
-            "tipos": TipoPerfil.objects.order_by("nome"),
+            "tipos": tipos_perfil_options(request),
             "tipo_form": tipo_form,
             "message": message,
         },
     )
 
 
+def _set_password_without_save(user, raw_password):
+    user.set_password(raw_password)
+    # Nenhum validador configurado usa password_changed, entao o save() do
+    # usuario nao tem efeito colateral alem do UPDATE.
+    User.objects.filter(pk=user.pk).update(password=user.password)
+
+
+def _usuarios_gerenciar_usuario_redirect(user_pk, message=None):
+    url = reverse("usuarios_gerenciar_usuario", kwargs={"pk": user_pk})
+    if message:
+        url = f"{url}?{urlencode({'msg': message})}"
+    return redirect(url)
+
+
 @login_required
 def usuarios_gerenciar_usuario(request, pk):
     if not _is_admin_user(request.user):
         return HttpResponseForbidden("Sem permissao.")
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
     user = get_object_or_404(User, pk=pk)
     perfil = _get_cliente(user)
-    message = None
-    if request.method == "POST":
-        action = request.POST.get("action")
-        if action == "update_user":
-            email = request.POST.get("email", "").strip().lower()
-            is_staff = request.POST.get("is_staff") == "on"
-            is_active = request.POST.get("is_active") == "on"
-            if not email:
-                message = "Informe um email valido."
-            else:
-                existing = User.objects.filter(username=email).exclude(pk=user.pk)
-                if existing.exists():
-                    message = "Email ja cadastrado."
-                else:
-                    user.username = email
-                    user.email = email
-                    user.is_staff = is_staff
-                    user.is_active = is_active
-                    user.save(update_fields=["username", "email", "is_staff", "is_active"])
-                    if perfil:
-                        perfil.email = email
-                        perfil.save(update_fields=["email"])
-                    return redirect("usuarios_gerenciar_usuario", pk=user.pk)
-        if action == "update_perfil":
-            nome = request.POST.get("nome", "").strip()
-            empresa = request.POST.get("empresa", "").strip()
-            sigla_cidade = request.POST.get("sigla_cidade", "").strip()
-            tipo_ids = request.POST.getlist("tipos")
-            plantas_raw = request.POST.get("plantas", "")
-            financeiros_raw = request.POST.get("financeiros", "")
-            inventarios_raw = request.POST.get("inventarios", "")
-            listas_ip_raw = request.POST.get("listas_ip", "")
-            radares_raw = request.POST.get("radares", "")
-            apps_raw = request.POST.get("apps", "")
-            if not perfil:
-                perfil = PerfilUsuario.objects.create(
-                    nome=nome or user.username.split("@")[0],
-                    email=user.email or user.username,
-                    usuario=user,
-                    ativo=True,
-                    empresa=empresa,
-                    sigla_cidade=sigla_cidade,
-                )
-                _ensure_default_cadernos(perfil)
-            else:
-                if nome:
-                    perfil.nome = nome
-                perfil.empresa = empresa
-                perfil.sigla_cidade = sigla_cidade
-                perfil.save(update_fields=["nome", "empresa", "sigla_cidade"])
-            tipos = TipoPerfil.objects.filter(id__in=tipo_ids)
-            perfil.tipos.set(tipos)
-            cleaned = plantas_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned = cleaned.replace(sep, ",")
-            codes = [code.strip().upper() for code in cleaned.split(",") if code.strip()]
-            plantas = [PlantaIO.objects.get_or_create(codigo=code)[0] for code in codes]
-            perfil.plantas.set(plantas)
-            cleaned_fin = financeiros_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_fin = cleaned_fin.replace(sep, ",")
-            fin_codes = [code.strip().upper() for code in cleaned_fin.split(",") if code.strip()]
-            financeiros = [FinanceiroID.objects.get_or_create(codigo=code)[0] for code in fin_codes]
-            perfil.financeiros.set(financeiros)
-            cleaned_inv = inventarios_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_inv = cleaned_inv.replace(sep, ",")
-            inv_codes = [code.strip().upper() for code in cleaned_inv.split(",") if code.strip()]
-            inventarios = [InventarioID.objects.get_or_create(codigo=code)[0] for code in inv_codes]
-            perfil.inventarios.set(inventarios)
-            cleaned_ip = listas_ip_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_ip = cleaned_ip.replace(sep, ",")
-            ip_codes = [code.strip().upper() for code in cleaned_ip.split(",") if code.strip()]
-            listas_ip = [ListaIPID.objects.get_or_create(codigo=code)[0] for code in ip_codes]
-            perfil.listas_ip.set(listas_ip)
-            cleaned_radar = radares_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_radar = cleaned_radar.replace(sep, ",")
-            radar_codes = [code.strip().upper() for code in cleaned_radar.split(",") if code.strip()]
-            radares = [RadarID.objects.get_or_create(codigo=code)[0] for code in radar_codes]
-            perfil.radares.set(radares)
-            cleaned_apps = apps_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_apps = cleaned_apps.replace(sep, ",")
-            app_slugs = [_clean_app_slug(code) for code in cleaned_apps.split(",") if code.strip()]
-            apps = []
-            for slug in app_slugs:
-                if not slug:
-                    continue
-                app, created = App.objects.get_or_create(slug=slug, defaults={"nome": slug})
-                if created and not app.nome:
-                    app.nome = slug
-                    app.save(update_fields=["nome"])
-                apps.append(app)
-            perfil.apps.set(apps)
-            now = timezone.now()
-            for product in ProdutoPlataforma.objects.order_by("nome"):
-                access_mode = (request.POST.get(f"produto_mode_{product.id}") or "").strip().upper()
-                existing_access = AcessoProdutoUsuario.objects.filter(usuario=user, produto=product).first()
-                if access_mode != "ON":
-                    if existing_access:
-                        existing_access.delete()
-                    continue
-                status = (
-                    request.POST.get(f"produto_status_{product.id}") or AcessoProdutoUsuario.Status.ATIVO
-                ).strip().upper()
-                origem = (
-                    request.POST.get(f"produto_origem_{product.id}") or AcessoProdutoUsuario.Origem.MANUAL
-                ).strip().upper()
-                trial_fim = _parse_local_date_boundary(request.POST.get(f"produto_trial_fim_{product.id}"), end=True)
-                acesso_fim = _parse_local_date_boundary(request.POST.get(f"produto_acesso_fim_{product.id}"), end=True)
-                observacao = (request.POST.get(f"produto_observacao_{product.id}") or "").strip()
-                defaults = {
-                    "origem": origem if origem in AcessoProdutoUsuario.Origem.values else AcessoProdutoUsuario.Origem.MANUAL,
-                    "status": status if status in AcessoProdutoUsuario.Status.values else AcessoProdutoUsuario.Status.ATIVO,
-                    "observacao": observacao,
-                    "trial_fim": None,
-                    "acesso_fim": None,
-                }
-                if existing_access:
-                    defaults["acesso_inicio"] = existing_access.acesso_inicio or now
-                    defaults["trial_inicio"] = existing_access.trial_inicio
-                else:
-                    defaults["acesso_inicio"] = now
-                    defaults["trial_inicio"] = None
-                if defaults["status"] == AcessoProdutoUsuario.Status.TRIAL_ATIVO:
-                    defaults["trial_inicio"] = defaults["trial_inicio"] or now
-                    if trial_fim:
-                        defaults["trial_fim"] = trial_fim
-                    elif existing_access and existing_access.trial_fim:
-                        defaults["trial_fim"] = existing_access.trial_fim
-                    else:
-                        defaults["trial_fim"] = now + timedelta(days=TRIAL_DURATION_DAYS)
-                    defaults["acesso_fim"] = None
-                else:
-                    defaults["acesso_fim"] = acesso_fim
-                    if defaults["status"] != AcessoProdutoUsuario.Status.EXPIRADO:
-                        defaults["trial_inicio"] = None
-                        defaults["trial_fim"] = None
-                AcessoProdutoUsuario.objects.update_or_create(
-                    usuario=user,
-                    produto=product,
-                    defaults=defaults,
-                )
-            return redirect("usuarios_gerenciar_usuario", pk=user.pk)
-        if action == "set_password":
-            new_password = request.POST.get("new_password", "").strip()
-            if new_password:
-                user.set_password(new_password)
-                user.save(update_fields=["password"])
-                message = "Senha atualizada."
-            else:
-                message = "Informe uma senha valida."
+    message = request.GET.get("msg", "").strip() or None
     product_access_rows = _build_product_access_rows(user)
     return render(
         request,
@@ -8982,7 +8972,7 @@ def usuarios_gerenciar_usuario(request, pk):
         {
             "user_item": user,
             "perfil": perfil,
-            "tipos": TipoPerfil.objects.order_by("nome"),
+            "tipos": tipos_perfil_options(request),
             "product_access_rows": product_access_rows,
             "product_access_count": sum(1 for row in product_access_rows if row["access"]),
             "product_status_choices": AcessoProdutoUsuario.Status.choices,
@@ -8992,6 +8982,150 @@ def usuarios_gerenciar_usuario(request, pk):
     )
 
 
+@login_required
+@require_POST
+def usuarios_gerenciar_usuario_email(request, pk):
+    if not _is_admin_user(request.user):
+        return HttpResponseForbidden("Sem permissao.")
+    user = get_object_or_404(User, pk=pk)
+    email = request.POST.get("email", "").strip().lower()
+    is_staff = request.POST.get("is_staff") == "on"
+    is_active = request.POST.get("is_active") == "on"
+    if not email:
+        return _usuarios_gerenciar_usuario_redirect(user.pk, "Informe um email valido.")
+    if User.objects.filter(username=email).exclude(pk=user.pk).exists():
+        return _usuarios_gerenciar_usuario_redirect(user.pk, "Email ja cadastrado.")
+    perfil = _get_cliente(user)
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(
+            username=email,
+            email=email,
+            is_staff=is_staff,
+            is_active=is_active,
+        )
+        if perfil:
+            PerfilUsuario.objects.filter(pk=perfil.pk).update(email=email)
+    return _usuarios_gerenciar_usuario_redirect(user.pk)
+
+
+@login_required
+@require_POST
+def usuarios_gerenciar_usuario_perfil(request, pk):
+    if not _is_admin_user(request.user):
+        return HttpResponseForbidden("Sem permissao.")
+    user = get_object_or_404(User, pk=pk)
+    perfil = _get_cliente(user)
+    nome = request.POST.get("nome", "").strip()
+    empresa = request.POST.get("empresa", "").strip()
+    sigla_cidade = request.POST.get("sigla_cidade", "").strip()
+    tipo_ids = request.POST.getlist("tipos")
+    plantas_raw = request.POST.get("plantas", "")
+    financeiros_raw = request.POST.get("financeiros", "")
+    inventarios_raw = request.POST.get("inventarios", "")
+    listas_ip_raw = request.POST.get("listas_ip", "")
+    radares_raw = request.POST.get("radares", "")
+    apps_raw = request.POST.get("apps", "")
+    with transaction.atomic():
+        if not perfil:
+            perfil = PerfilUsuario.objects.create(
+                nome=nome or user.username.split("@")[0],
+                email=user.email or user.username,
+                usuario=user,
+                ativo=True,
+                empresa=empresa,
+                sigla_cidade=sigla_cidade,
+            )
+            _ensure_default_cadernos(perfil)
+        elif (perfil.nome, perfil.empresa, perfil.sigla_cidade) != (nome or perfil.nome, empresa, sigla_cidade):
+            if nome:
+                perfil.nome = nome
+            perfil.empresa = empresa
+            perfil.sigla_cidade = sigla_cidade
+            perfil.save(update_fields=["nome", "empresa", "sigla_cidade"])
+        selected_tipo_ids = {int(tipo_id) for tipo_id in tipo_ids if tipo_id.isdigit()}
+        if selected_tipo_ids != set(perfil.tipos.values_list("id", flat=True)):
+            tipos = TipoPerfil.objects.filter(id__in=tipo_ids)
+            perfil.tipos.set(tipos)
+        _sync_perfil_codes(perfil.plantas, PlantaIO, _parse_codes(plantas_raw))
+        _sync_perfil_codes(perfil.financeiros, FinanceiroID, _parse_codes(financeiros_raw))
+        _sync_perfil_codes(perfil.inventarios, InventarioID, _parse_codes(inventarios_raw))
+        _sync_perfil_codes(perfil.listas_ip, ListaIPID, _parse_codes(listas_ip_raw))
+        _sync_perfil_codes(perfil.radares, RadarID, _parse_codes(radares_raw))
+        app_slugs = list(dict.fromkeys(slug for slug in map(_clean_app_slug, _split_codes(apps_raw)) if slug))
+        if set(app_slugs) != set(perfil.apps.values_list("slug", flat=True)):
+            app_ids = []
+            for slug in app_slugs:
+                app, created = App.objects.get_or_create(slug=slug, defaults={"nome": slug})
+                if created and not app.nome:
+                    app.nome = slug
+                    app.save(update_fields=["nome"])
+                app_ids.append(app.pk)
+            perfil.apps.set(app_ids)
+        now = timezone.now()
+        for product in ProdutoPlataforma.objects.order_by("nome"):
+            access_mode = (request.POST.get(f"produto_mode_{product.id}") or "").strip().upper()
+            existing_access = AcessoProdutoUsuario.objects.filter(usuario=user, produto=product).first()
+            if access_mode != "ON":
+                if existing_access:
+                    existing_access.delete()
+                continue
+            status = (
+                request.POST.get(f"produto_status_{product.id}") or AcessoProdutoUsuario.Status.ATIVO
+            ).strip().upper()
+            origem = (
+                request.POST.get(f"produto_origem_{product.id}") or AcessoProdutoUsuario.Origem.MANUAL
+            ).strip().upper()
+            trial_fim = _parse_local_date_boundary(request.POST.get(f"produto_trial_fim_{product.id}"), end=True)
+            acesso_fim = _parse_local_date_boundary(request.POST.get(f"produto_acesso_fim_{product.id}"), end=True)
+            observacao = (request.POST.get(f"produto_observacao_{product.id}") or "").strip()
+            defaults = {
+                "origem": origem if origem in AcessoProdutoUsuario.Origem.values else AcessoProdutoUsuario.Origem.MANUAL,
+                "status": status if status in AcessoProdutoUsuario.Status.values else AcessoProdutoUsuario.Status.ATIVO,
+                "observacao": observacao,
+                "trial_fim": None,
+                "acesso_fim": None,
+            }
+            if existing_access:
+                defaults["acesso_inicio"] = existing_access.acesso_inicio or now
+                defaults["trial_inicio"] = existing_access.trial_inicio
+            else:
+                defaults["acesso_inicio"] = now
+                defaults["trial_inicio"] = None
+            if defaults["status"] == AcessoProdutoUsuario.Status.TRIAL_ATIVO:
+                defaults["trial_inicio"] = defaults["trial_inicio"] or now
+                if trial_fim:
+                    defaults["trial_fim"] = trial_fim
+                elif existing_access and existing_access.trial_fim:
+                    defaults["trial_fim"] = existing_access.trial_fim
+                else:
+                    defaults["trial_fim"] = now + timedelta(days=TRIAL_DURATION_DAYS)
+                defaults["acesso_fim"] = None
+            else:
+                defaults["acesso_fim"] = acesso_fim
+                if defaults["status"] != AcessoProdutoUsuario.Status.EXPIRADO:
+                    defaults["trial_inicio"] = None
+                    defaults["trial_fim"] = None
+            AcessoProdutoUsuario.objects.update_or_create(
+                usuario=user,
+                produto=product,
+                defaults=defaults,
+            )
+    return _usuarios_gerenciar_usuario_redirect(user.pk)
+
+
+@login_required
+@require_POST
+def usuarios_gerenciar_usuario_senha(request, pk):
+    if not _is_admin_user(request.user):
+        return HttpResponseForbidden("Sem permissao.")
+    user = get_object_or_404(User, pk=pk)
+    new_password = request.POST.get("new_password", "").strip()
+    if not new_password:
+        return _usuarios_gerenciar_usuario_redirect(user.pk, "Informe uma senha valida.")
+    _set_password_without_save(user, new_password)
+    return _usuarios_gerenciar_usuario_redirect(user.pk, "Senha atualizada.")
+
+
 @login_required
 def meu_perfil(request):
     user = request.user
@@ -9011,12 +9145,9 @@ def meu_perfil(request):
                     message = "Email ja cadastrado."
                     message_level = "error"
                 else:
-                    user.username = email
-                    user.email = email
-                    user.save(update_fields=["username", "email"])
+                    User.objects.filter(pk=user.pk).update(username=email, email=email)
                     if perfil:
-                        perfil.email = email
-                        perfil.save(update_fields=["email"])
+                        PerfilUsuario.objects.filter(pk=perfil.pk).update(email=email)
                     return redirect("meu_perfil")
         if action == "update_profile":
             nome = request.POST.get("nome", "").strip()
@@ -9037,48 +9168,22 @@ def meu_perfil(request):
                     sigla_cidade=sigla_cidade,
                 )
                 _ensure_default_cadernos(perfil)
-            else:
+            elif (perfil.nome, perfil.empresa, perfil.sigla_cidade) != (nome or perfil.nome, empresa, sigla_cidade):
                 if nome:
                     perfil.nome = nome
                 perfil.empresa = empresa
                 perfil.sigla_cidade = sigla_cidade
                 perfil.save(update_fields=["nome", "empresa", "sigla_cidade"])
-            cleaned = plantas_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned = cleaned.replace(sep, ",")
-            codes = [code.strip().upper() for code in cleaned.split(",") if code.strip()]
-            plantas = [PlantaIO.objects.get_or_create(codigo=code)[0] for code in codes]
-            perfil.plantas.set(plantas)
-            cleaned_fin = financeiros_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_fin = cleaned_fin.replace(sep, ",")
-            fin_codes = [code.strip().upper() for code in cleaned_fin.split(",") if code.strip()]
-            financeiros = [FinanceiroID.objects.get_or_create(codigo=code)[0] for code in fin_codes]
-            perfil.financeiros.set(financeiros)
-            cleaned_inv = inventarios_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_inv = cleaned_inv.replace(sep, ",")
-            inv_codes = [code.strip().upper() for code in cleaned_inv.split(",") if code.strip()]
-            inventarios = [InventarioID.objects.get_or_create(codigo=code)[0] for code in inv_codes]
-            perfil.inventarios.set(inventarios)
-            cleaned_ip = listas_ip_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_ip = cleaned_ip.replace(sep, ",")
-            ip_codes = [code.strip().upper() for code in cleaned_ip.split(",") if code.strip()]
-            listas_ip = [ListaIPID.objects.get_or_create(codigo=code)[0] for code in ip_codes]
-            perfil.listas_ip.set(listas_ip)
-            cleaned_radar = radares_raw
-            for sep in [";", "\n", "\r", "\t"]:
-                cleaned_radar = cleaned_radar.replace(sep, ",")
-            radar_codes = [code.strip().upper() for code in cleaned_radar.split(",") if code.strip()]
-            radares = [RadarID.objects.get_or_create(codigo=code)[0] for code in radar_codes]
-            perfil.radares.set(radares)
+            _sync_perfil_codes(perfil.plantas, PlantaIO, _parse_codes(plantas_raw))
+            _sync_perfil_codes(perfil.financeiros, FinanceiroID, _parse_codes(financeiros_raw))
+            _sync_perfil_codes(perfil.inventarios, InventarioID, _parse_codes(inventarios_raw))
+            _sync_perfil_codes(perfil.listas_ip, ListaIPID, _parse_codes(listas_ip_raw))
+            _sync_perfil_codes(perfil.radares, RadarID, _parse_codes(radares_raw))
             return redirect("meu_perfil")
         if action == "set_password":
             new_password = request.POST.get("new_password", "").strip()
             if new_password:
-                user.set_password(new_password)
-                user.save(update_fields=["password"])
+                _set_password_without_save(user, new_password)
                 message = "Senha atualizada."
                 message_level = "success"
             else:
@@ -9173,11 +9278,7 @@ def financeiro_overview(request):
         output_field=DecimalField(max_digits=12, decimal_places=2),
     )
     today = timezone.localdate()
-    start_date = date(today.year, today.month, 1)
-    if today.month == 12:
-        end_date = date(today.year + 1, 1, 1)
-    else:
-        end_date = date(today.year, today.month + 1, 1)
+    start_date, end_date, _ = _month_bounds(today.year, today.month)
     item_expr = ExpressionWrapper(
         F("itens__valor") * F("itens__quantidade"),
         output_field=DecimalField(max_digits=12, decimal_places=2),
@@ -9190,7 +9291,6 @@ def financeiro_overview(request):
     ).order_by("nome")
     compras_qs = _financeiro_allowed_compras_qs(request.user, cliente)
     total_geral = compras_qs.aggregate(total=Sum(item_expr)).get("total")
-    ultimas_compras = compras_qs.prefetch_related("itens").order_by("-data")[:6]
 
     caderno_id = request.GET.get("caderno_id")
     compras = Compra.objects.none()
@@ -9207,7 +9307,6 @@ def financeiro_overview(request):
             "total_geral": total_geral or 0,
             "compras": compras,
             "caderno_id": caderno_id,
-            "ultimas_compras": ultimas_compras,
         },
     )
 
@@ -9230,25 +9329,26 @@ def financeiro_nova(request):
         if action == "create_categoria":
             nome = request.POST.get("categoria_nome", "").strip()
             next_caderno_id = request.POST.get("next_caderno_id", "").strip()
+            categoria = None
             if not nome:
                 msg = "Informe um nome de categoria."
                 level = "error"
                 created = False
             else:
-                categoria, created = CategoriaCompra.objects.get_or_create(nome=nome)
+                categoria, created = _get_or_create_by_nome(CategoriaCompra, nome)
                 if created:
                     msg = "Categoria criada."
                     level = "success"
                 else:
                     msg = "Categoria ja existe."
                     level = "warning"
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
+            if _is_ajax_request(request):
                 return JsonResponse(
                     {
                         "ok": bool(nome),
                         "created": created,
-                        "id": categoria.id if nome and "categoria" in locals() else None,
-                        "nome": categoria.nome if nome and "categoria" in locals() else None,
+                        "id": categoria.id if categoria else None,
+                        "nome": categoria.nome if categoria else None,
                         "message": msg,
                         "level": level,
                     }
@@ -9260,25 +9360,26 @@ def financeiro_nova(request):
         if action == "create_centro":
             nome = request.POST.get("centro_nome", "").strip()
             next_caderno_id = request.POST.get("next_caderno_id", "").strip()
+            centro = None
             if not nome:
                 msg = "Informe um nome de centro de custo."
                 level = "error"
                 created = False
             else:
-                centro, created = CentroCusto.objects.get_or_create(nome=nome)
+                centro, created = _get_or_create_by_nome(CentroCusto, nome)
                 if created:
                     msg = "Centro de custo criado."
                     level = "success"
                 else:
                     msg = "Centro de custo ja existe."
                     level = "warning"
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
+            if _is_ajax_request(request):
                 return JsonResponse(
                     {
                         "ok": bool(nome),
                         "created": created,
-                        "id": centro.id if nome and "centro" in locals() else None,
-                        "nome": centro.nome if nome and "centro" in locals() else None,
+                        "id": centro.id if centro else None,
+                        "nome": centro.nome if centro else None,
                         "message": msg,
                         "level": level,
                     }
@@ -9308,7 +9409,7 @@ def financeiro_nova(request):
                 source_compra_qs = Compra.objects.filter(pk=source_compra_id)
                 if not _is_admin_user(request.user):
                     source_compra_qs = source_compra_qs.filter(
-                        Q(caderno__criador=cliente) | Q(caderno__id_financeiro__in=cliente.financeiros.all())
+                        Q(caderno__criador=cliente) | Q(caderno__id_financeiro__in=_cliente_financeiro_ids(cliente))
                     )
                 source_compra = source_compra_qs.first()
             for idx in range(total_items):
@@ -9341,7 +9442,6 @@ def financeiro_nova(request):
                 data = datetime.strptime(data_raw, "%Y-%m-%d").date()
             except ValueError:
                 data = None
-            allowed_cadernos = _financeiro_allowed_cadernos_qs(request.user, cliente)
             has_any = any(
                 [
                     caderno_id,
@@ -9355,7 +9455,7 @@ def financeiro_nova(request):
                 ]
             )
             if has_any:
-                if caderno_id and not allowed_cadernos.filter(id=caderno_id).exists():
+                if caderno_id and caderno_id not in _financeiro_allowed_caderno_ids(request.user, cliente):
                     return redirect("financeiro")
                 compra = Compra.objects.create(
                     caderno_id=caderno_id or None,
@@ -9396,9 +9496,9 @@ def financeiro_nova(request):
             return redirect("financeiro")
 
     cadernos = _financeiro_allowed_cadernos_qs(request.user, cliente)
-    categorias = CategoriaCompra.objects.order_by("nome")
-    centros = CentroCusto.objects.order_by("nome")
-    tipos = TipoCompra.objects.order_by("nome")
+    categorias = financeiro_options(request, CategoriaCompra)
+    centros = financeiro_options(request, CentroCusto)
+    tipos = financeiro_options(request, TipoCompra)
     selected_caderno_id = request.GET.get("caderno_id") or ""
     initial = {
         "nome": "",
@@ -9413,7 +9513,7 @@ def financeiro_nova(request):
         compra_qs = Compra.objects.filter(pk=from_compra_id)
         if not _is_admin_user(request.user):
             compra_qs = compra_qs.filter(
-                Q(caderno__criador=cliente) | Q(caderno__id_financeiro__in=cliente.financeiros.all())
+                Q(caderno__criador=cliente) | Q(caderno__id_financeiro__in=_cliente_financeiro_ids(cliente))
             )
         compra_ref = (
             compra_qs.select_related("categoria", "centro_custo", "caderno")
@@ -9492,25 +9592,26 @@ def financeiro_cadernos(request):
             return redirect("financeiro_cadernos")
         if action == "create_categoria":
             nome = request.POST.get("categoria_nome", "").strip()
+            categoria = None
             if not nome:
                 msg = "Informe um nome de categoria."
                 level = "error"
                 created = False
             else:
-                categoria, created = CategoriaCompra.objects.get_or_create(nome=nome)
+                categoria, created = _get_or_create_by_nome(CategoriaCompra, nome)
                 if created:
                     msg = "Categoria criada."
                     level = "success"
                 else:
                     msg = "Categoria ja existe."
                     level = "warning"
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
+            if _is_ajax_request(request):
                 return JsonResponse(
                     {
                         "ok": bool(nome),
                         "created": created,
-                        "id": categoria.id if nome and "categoria" in locals() else None,
-                        "nome": categoria.nome if nome and "categoria" in locals() else None,
+                        "id": categoria.id if categoria else None,
+                        "nome": categoria.nome if categoria else None,
                         "message": msg,
                         "level": level,
                     }
@@ -9519,25 +9620,26 @@ def financeiro_cadernos(request):
             return redirect(f"{reverse('financeiro_cadernos')}?{urlencode(params)}")
         if action == "create_centro":
             nome = request.POST.get("centro_nome", "").strip()
+            centro = None
             if not nome:
                 msg = "Informe um nome de centro de custo."
                 level = "error"
                 created = False
             else:
-                centro, created = CentroCusto.objects.get_or_create(nome=nome)
+                centro, created = _get_or_create_by_nome(CentroCusto, nome)
                 if created:
                     msg = "Centro de custo criado."
                     level = "success"
                 else:
                     msg = "Centro de custo ja existe."
                     level = "warning"
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
+            if _is_ajax_request(request):
                 return JsonResponse(
                     {
                         "ok": bool(nome),
                         "created": created,
-                        "id": centro.id if nome and "centro" in locals() else None,
-                        "nome": centro.nome if nome and "centro" in locals() else None,
+                        "id": centro.id if centro else None,
+                        "nome": centro.nome if centro else None,
                         "message": msg,
                         "level": level,
                     }
@@ -9576,129 +9678,114 @@ def financeiro_caderno_detail(request, pk):
         return HttpResponseForbidden("Sem cadastro de cliente.")
     caderno = get_object_or_404(_financeiro_allowed_cadernos_qs(request.user, cliente), pk=pk)
     today = timezone.localdate()
-    selected_month = request.GET.get("mes", "").strip()
-    if selected_month:
-        try:
-            selected_dt = datetime.strptime(selected_month, "%Y-%m")
-        except ValueError:
-            selected_dt = datetime(today.year, today.month, 1)
-            selected_month = selected_dt.strftime("%Y-%m")
-    else:
-        selected_dt = datetime(today.year, today.month, 1)
-        selected_month = selected_dt.strftime("%Y-%m")
-    if selected_dt.month == 1:
-        prev_dt = datetime(selected_dt.year - 1, 12, 1)
-    else:
-        prev_dt = datetime(selected_dt.year, selected_dt.month - 1, 1)
-    if selected_dt.month == 12:
-        next_dt = datetime(selected_dt.year + 1, 1, 1)
-    else:
-        next_dt = datetime(selected_dt.year, selected_dt.month + 1, 1)
-    prev_month = prev_dt.strftime("%Y-%m")
-    next_month = next_dt.strftime("%Y-%m")
+    try:
+        selected_dt = datetime.strptime(request.GET.get("mes", "").strip(), "%Y-%m").date()
+    except ValueError:
+        selected_dt = today
+    start_date, end_date, prev_date = _month_bounds(selected_dt.year, selected_dt.month)
+    selected_month = start_date.strftime("%Y-%m")
+    prev_month = prev_date.strftime("%Y-%m")
+    next_month = end_date.strftime("%Y-%m")
     current_month = today.strftime("%Y-%m")
-    start_date = date(selected_dt.year, selected_dt.month, 1)
-    if selected_dt.month == 12:
-        end_date = date(selected_dt.year + 1, 1, 1)
-    else:
-        end_date = date(selected_dt.year, selected_dt.month + 1, 1)
     zero_money = Decimal("0.00")
 
-    def build_compra_row(compra_obj):
-        itens = list(compra_obj.itens.all())
-        status_label = _compra_status_label(compra_obj)
-        status_key = status_label.lower()
-        total_itens = sum(
-            ((item.valor or zero_money) * (item.quantidade or 0) for item in itens),
-            zero_money,
-        )
-        total_pago = sum(
-            ((item.valor or zero_money) * (item.quantidade or 0) for item in itens if item.pago),
-            zero_money,
+    item_total = ExpressionWrapper(
+        F("itens__valor") * F("itens__quantidade"),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    money_field = DecimalField(max_digits=14, decimal_places=2)
+
+    def compras_rows_qs():
+        # Totais e contagem de itens calculados no banco; so as colunas exibidas na tabela.
+        return (
+            Compra.objects.filter(caderno=caderno)
+            .select_related("categoria", "centro_custo")
+            .only("id", "nome", "descricao", "data", "caderno_id", "categoria__nome", "centro_custo__nome")
+            .annotate(
+                total_itens=Coalesce(Sum(item_total), Value(zero_money), output_field=money_field),
+                total_pago=Coalesce(
+                    Sum(item_total, filter=Q(itens__pago=True)), Value(zero_money), output_field=money_field
+                ),
+                itens_count=Count("itens"),
+                itens_pagos=Count("itens", filter=Q(itens__pago=True)),
+            )
         )
-        total_pendente = total_itens - total_pago
-        compra_obj.status_label = status_label
-        compra_obj.total_itens = total_itens
-        compra_obj.total_pago = total_pago
-        compra_obj.total_pendente = total_pendente
-        compra_obj.itens_count = len(itens)
+
+    def annotate_compra_status(compra_obj):
+        is_pago = compra_obj.itens_count and compra_obj.itens_pagos == compra_obj.itens_count
+        compra_obj.status_label = "Pago" if is_pago else "Pendente"
+        compra_obj.total_pendente = compra_obj.total_itens - compra_obj.total_pago
+        return compra_obj
+
+    def build_compra_row(compra_obj):
+        annotate_compra_status(compra_obj)
+        status_label = compra_obj.status_label
         return {
             "id": compra_obj.id,
             "nome": (compra_obj.nome or "").strip(),
             "descricao": (compra_obj.descricao or "").strip(),
-            "status": status_key,
+            "status": status_label.lower(),
             "status_label": status_label,
             "data": compra_obj.data.isoformat() if compra_obj.data else "",
             "data_label": compra_obj.data.strftime("%d/%m/%Y") if compra_obj.data else "-",
             "itens_count": compra_obj.itens_count,
-            "total_itens": str(total_itens.quantize(Decimal("0.01"))),
-            "total_pago": str(total_pago.quantize(Decimal("0.01"))),
-            "total_pendente": str(total_pendente.quantize(Decimal("0.01"))),
+            "total_itens": str(compra_obj.total_itens.quantize(Decimal("0.01"))),
+            "total_pago": str(compra_obj.total_pago.quantize(Decimal("0.01"))),
+            "total_pendente": str(compra_obj.total_pendente.quantize(Decimal("0.01"))),
             "categoria": compra_obj.categoria.nome if compra_obj.categoria else "",
             "centro": compra_obj.centro_custo.nome if compra_obj.centro_custo else "",
             "detalhe_url": reverse("financeiro_compra_detail", args=[compra_obj.pk]),
         }
 
-    def build_month_summary_payload():
-        month_compras = (
+    def month_totals():
+        # Totais do mes direto no banco: soma dos itens e contagem de compras pagas/pendentes.
+        totals = CompraItem.objects.filter(
+            compra__caderno=caderno, compra__data__gte=start_date, compra__data__lt=end_date
+        ).aggregate(
+            total_mes=Coalesce(Sum(F("valor") * F("quantidade"), output_field=money_field), Value(zero_money)),
+            total_pago=Coalesce(
+                Sum(F("valor") * F("quantidade"), filter=Q(pago=True), output_field=money_field),
+                Value(zero_money),
+            ),
+        )
+        totals.update(
             Compra.objects.filter(caderno=caderno, data__gte=start_date, data__lt=end_date)
-            .prefetch_related("itens")
-            .order_by("id")
+            .annotate(itens_count=Count("itens"), itens_pagos=Count("itens", filter=Q(itens__pago=True)))
+            .aggregate(
+                total_compras=Count("id"),
+                total_pagas=Count("id", filter=Q(itens_count__gt=0, itens_pagos=F("itens_count"))),
+            )
         )
-        summary_total_mes = Decimal("0.00")
-        summary_total_pago = Decimal("0.00")
-        summary_total_pendente = Decimal("0.00")
-        summary_total_compras = 0
-        for compra_mes in month_compras:
-            row = build_compra_row(compra_mes)
-            summary_total_mes += Decimal(row["total_itens"])
-            summary_total_pago += Decimal(row["total_pago"])
-            summary_total_pendente += Decimal(row["total_pendente"])
-            summary_total_compras += 1
+        totals["total_pendente"] = totals["total_mes"] - totals["total_pago"]
+        totals["total_pendentes"] = totals["total_compras"] - totals["total_pagas"]
+        return totals
+
+    def build_month_summary_payload():
+        totals = month_totals()
         return {
-            "total_mes": str(summary_total_mes.quantize(Decimal("0.01"))),
-            "total_pago": str(summary_total_pago.quantize(Decimal("0.01"))),
-            "total_pendente": str(summary_total_pendente.quantize(Decimal("0.01"))),
-            "total_compras": summary_total_compras,
+            "total_mes": str(totals["total_mes"].quantize(Decimal("0.01"))),
+            "total_pago": str(totals["total_pago"].quantize(Decimal("0.01"))),
+            "total_pendente": str(totals["total_pendente"].quantize(Decimal("0.01"))),
+            "total_compras": totals["total_compras"],
         }
 
     def build_month_snapshot():
         month_compras = (
-            Compra.objects.filter(caderno=caderno, data__gte=start_date, data__lt=end_date)
-            .select_related("categoria", "centro_custo")
-            .prefetch_related("itens")
-            .order_by("-data", "-id")
+            compras_rows_qs().filter(data__gte=start_date, data__lt=end_date).order_by("-data", "-id")
         )
-        month_rows = []
-        total_mes = Decimal("0.00")
-        total_pago = Decimal("0.00")
-        total_pendente = Decimal("0.00")
-        total_compras = 0
-        total_pagas = 0
-        total_pendentes = 0
-
-        for compra_mes in month_compras:
-            row = build_compra_row(compra_mes)
-            month_rows.append(row)
-            total_mes += Decimal(row["total_itens"])
-            total_pago += Decimal(row["total_pago"])
-            total_pendente += Decimal(row["total_pendente"])
-            total_compras += 1
-            if row["status"] == "pago":
-                total_pagas += 1
-            else:
-                total_pendentes += 1
-
-        ticket_medio = total_mes / total_compras if total_compras else Decimal("0.00")
+        month_rows = [build_compra_row(compra_mes) for compra_mes in month_compras]
+        totals = month_totals()
+        total_compras = totals["total_compras"]
+        ticket_medio = totals["total_mes"] / total_compras if total_compras else Decimal("0.00")
         return {
             "rows": month_rows,
             "summary": {
-                "total_mes": total_mes,
-                "total_pago": total_pago,
-                "total_pendente": total_pendente,
+                "total_mes": totals["total_mes"],
+                "total_pago": totals["total_pago"],
+                "total_pendente": totals["total_pendente"],
                 "total_compras": total_compras,
-                "total_pagas": total_pagas,
-                "total_pendentes": total_pendentes,
+                "total_pagas": totals["total_pagas"],
+                "total_pendentes": totals["total_pendentes"],
                 "ticket_medio": ticket_medio,
             },
         }
@@ -9786,17 +9873,12 @@ def financeiro_caderno_detail(request, pk):
                 parcela="1/1",
                 pago=False,
             )
-        compra = (
-            Compra.objects.filter(pk=compra.pk)
-            .select_related("categoria", "centro_custo")
-            .prefetch_related("itens")
-            .get()
-        )
+        compra = compras_rows_qs().get(pk=compra.pk)
         row_payload = build_compra_row(compra)
         in_selected_month = bool(data_compra and start_date <= data_compra < end_date)
         month_summary = build_month_summary_payload() if in_selected_month else None
 
-        if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        if _is_ajax_request(request):
             message = "Compra criada."
             if item_nome:
                 message = "Compra criada com item inicial."
@@ -9814,7 +9896,7 @@ def financeiro_caderno_detail(request, pk):
             )
         return redirect("financeiro_compra_detail", pk=compra.pk)
 
-    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+    if _is_ajax_request(request):
         month_snapshot = build_month_snapshot()
         navigation_payload = build_month_navigation_payload()
         return JsonResponse(
@@ -9831,33 +9913,13 @@ def financeiro_caderno_detail(request, pk):
             }
         )
 
-    compras_base_qs = (
-        Compra.objects.filter(caderno=caderno)
-        .select_related("categoria", "centro_custo")
-        .prefetch_related("itens")
-        .order_by("-data", "-id")
-    )
-    compras_sem_data_qs = compras_base_qs.filter(data__isnull=True)
+    compras_sem_data_qs = compras_rows_qs().filter(data__isnull=True).order_by("-id")
 
     month_snapshot = build_month_snapshot()
     compras_table_data = month_snapshot["rows"]
     resumo = month_snapshot["summary"]
-    compras_sem_data = []
-
-    for compra in compras_sem_data_qs:
-        itens = list(compra.itens.all())
-        compra.status_label = _compra_status_label(compra)
-        compra.total_itens = sum(
-            ((item.valor or zero_money) * (item.quantidade or 0) for item in itens),
-            zero_money,
-        )
-        compra.total_pago = sum(
-            ((item.valor or zero_money) * (item.quantidade or 0) for item in itens if item.pago),
-            zero_money,
-        )
-        compra.total_pendente = compra.total_itens - compra.total_pago
-        compra.itens_count = len(itens)
-        compras_sem_data.append(compra)
+    compras_sem_data_page = Paginator(compras_sem_data_qs, 50).get_page(request.GET.get("page"))
+    compras_sem_data = [annotate_compra_status(compra) for compra in compras_sem_data_page]
     return render(
         request,
         "core/financeiro_caderno_detail.html",
@@ -9865,238 +9927,239 @@ def financeiro_caderno_detail(request, pk):
             "caderno": caderno,
             "compras_table_data": compras_table_data,
             "compras_sem_data": compras_sem_data,
+            "compras_sem_data_page": compras_sem_data_page,
+            "page_query": urlencode({"mes": selected_month}),
             "selected_month": selected_month,
             "mes_referencia": start_date,
             "prev_month": prev_month,
             "next_month": next_month,
             "current_month": current_month,
             "quick_create_date": build_month_navigation_payload()["quick_create_date"],
-            "categorias": CategoriaCompra.objects.order_by("nome"),
-            "centros": CentroCusto.objects.order_by("nome"),
+            "categorias": financeiro_options(request, CategoriaCompra),
+            "centros": financeiro_options(request, CentroCusto),
             "resumo": resumo,
         },
     )
 
 
-@login_required
-def financeiro_compra_detail(request, pk):
-    denied_response = _require_internal_module_access(request, "FINANCEIRO")
-    if denied_response:
-        return denied_response
-    cliente = _get_cliente(request.user)
-    if not cliente and not _is_admin_user(request.user):
-        return HttpResponseForbidden("Sem cadastro de cliente.")
-    compra = get_object_or_404(_financeiro_allowed_compras_qs(request.user, cliente), pk=pk)
-    zero_money = Decimal("0.00")
+_ZERO_MONEY = Decimal("0.00")
+
+
+def _compra_item_payload(item):
+    total_valor = (item.valor or _ZERO_MONEY) * (item.quantidade or 0)
+    return {
+        "id": item.id,
+        "nome": item.nome,
+        "quantidade": item.quantidade,
+        "valor": str((item.valor or _ZERO_MONEY).quantize(Decimal("0.01"))),
+        "parcela": item.parcela or "1/1",
+        "total": str(total_valor.quantize(Decimal("0.01"))),
+        "tipo": item.tipo.nome if item.tipo else "",
+        "pago_status": "pago" if item.pago else "pendente",
+        "pago_label": "Pago" if item.pago else "Pendente",
+    }
+
+
+def _compra_summary_payload(compra_obj):
+    itens_compra = list(compra_obj.itens.all())
+    total_itens = sum(
+        ((item.valor or _ZERO_MONEY) * (item.quantidade or 0) for item in itens_compra),
+        _ZERO_MONEY,
+    )
+    total_pago = sum(
+        ((item.valor or _ZERO_MONEY) * (item.quantidade or 0) for item in itens_compra if item.pago),
+        _ZERO_MONEY,
+    )
+    total_pendente = total_itens - total_pago
+    status_label = _compra_status_label(compra_obj)
+    return {
+        "id": compra_obj.id,
+        "status": status_label.lower(),
+        "status_label": status_label,
+        "itens_count": len(itens_compra),
+        "total_itens": str(total_itens.quantize(Decimal("0.01"))),
+        "total_pago": str(total_pago.quantize(Decimal("0.01"))),
+        "total_pendente": str(total_pendente.quantize(Decimal("0.01"))),
+    }
 
-    def serialize_item_payload(item):
-        total_valor = (item.valor or zero_money) * (item.quantidade or 0)
-        return {
-            "id": item.id,
-            "nome": item.nome,
-            "quantidade": item.quantidade,
-            "valor": str((item.valor or zero_money).quantize(Decimal("0.01"))),
-            "parcela": item.parcela or "1/1",
-            "total": str(total_valor.quantize(Decimal("0.01"))),
-            "tipo": item.tipo.nome if item.tipo else "",
-            "pago_status": "pago" if item.pago else "pendente",
-            "pago_label": "Pago" if item.pago else "Pendente",
-        }
 
-    def serialize_compra_summary(compra_obj):
-        itens_compra = list(compra_obj.itens.all())
-        total_itens = sum(
-            ((item.valor or zero_money) * (item.quantidade or 0) for item in itens_compra),
-            zero_money,
+def _compra_detail_redirect(compra, params):
+    return redirect(f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}")
+
+
+def _compra_detail_create_categoria(request, compra, cliente):
+    nome = request.POST.get("categoria_nome", "").strip()
+    categoria = None
+    if not nome:
+        msg = "Informe um nome de categoria."
+        level = "error"
+        created = False
+    else:
+        categoria, created = _get_or_create_by_nome(CategoriaCompra, nome)
+        if created:
+            msg = "Categoria criada."
+            level = "success"
+        else:
+            msg = "Categoria ja existe."
+            level = "warning"
+    if _is_ajax_request(request):
+        return JsonResponse(
+            {
+                "ok": bool(nome),
+                "created": created,
+                "id": categoria.id if categoria else None,
+                "nome": categoria.nome if categoria else None,
+                "message": msg,
+                "level": level,
+            }
         )
-        total_pago = sum(
-            ((item.valor or zero_money) * (item.quantidade or 0) for item in itens_compra if item.pago),
-            zero_money,
+    params = {"cadastro": "categoria", "msg": msg, "level": level}
+    return _compra_detail_redirect(compra, params)
+
+
+def _compra_detail_create_centro(request, compra, cliente):
+    nome = request.POST.get("centro_nome", "").strip()
+    centro = None
+    if not nome:
+        msg = "Informe um nome de centro de custo."
+        level = "error"
+        created = False
+    else:
+        centro, created = _get_or_create_by_nome(CentroCusto, nome)
+        if created:
+            msg = "Centro de custo criado."
+            level = "success"
+        else:
+            msg = "Centro de custo ja existe."
+            level = "warning"
+    if _is_ajax_request(request):
+        return JsonResponse(
+            {
+                "ok": bool(nome),
+                "created": created,
+                "id": centro.id if centro else None,
+                "nome": centro.nome if centro else None,
+                "message": msg,
+                "level": level,
+            }
         )
-        total_pendente = total_itens - total_pago
-        status_label = _compra_status_label(compra_obj)
-        return {
-            "id": compra_obj.id,
-            "status": status_label.lower(),
-            "status_label": status_label,
-            "itens_count": len(itens_compra),
-            "total_itens": str(total_itens.quantize(Decimal("0.01"))),
-            "total_pago": str(total_pago.quantize(Decimal("0.01"))),
-            "total_pendente": str(total_pendente.quantize(Decimal("0.01"))),
-        }
+    params = {"cadastro": "centro", "msg": msg, "level": level}
+    return _compra_detail_redirect(compra, params)
 
-    message = request.GET.get("msg", "").strip()
-    message_level = request.GET.get("level", "").strip() or "info"
-    open_cadastro = request.GET.get("cadastro", "").strip()
-    if request.method == "POST":
-        action = request.POST.get("action")
-        if action == "create_categoria":
-            nome = request.POST.get("categoria_nome", "").strip()
-            if not nome:
-                msg = "Informe um nome de categoria."
-                level = "error"
-                created = False
-            else:
-                categoria, created = CategoriaCompra.objects.get_or_create(nome=nome)
-                if created:
-                    msg = "Categoria criada."
-                    level = "success"
-                else:
-                    msg = "Categoria ja existe."
-                    level = "warning"
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
-                return JsonResponse(
-                    {
-                        "ok": bool(nome),
-                        "created": created,
-                        "id": categoria.id if nome and "categoria" in locals() else None,
-                        "nome": categoria.nome if nome and "categoria" in locals() else None,
-                        "message": msg,
-                        "level": level,
-                    }
-                )
-            params = {"cadastro": "categoria", "msg": msg, "level": level}
-            return redirect(f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}")
-        if action == "create_centro":
-            nome = request.POST.get("centro_nome", "").strip()
-            if not nome:
-                msg = "Informe um nome de centro de custo."
-                level = "error"
-                created = False
-            else:
-                centro, created = CentroCusto.objects.get_or_create(nome=nome)
-                if created:
-                    msg = "Centro de custo criado."
-                    level = "success"
-                else:
-                    msg = "Centro de custo ja existe."
-                    level = "warning"
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
-                return JsonResponse(
+
+def _compra_detail_delete_compra(request, compra, cliente):
+    caderno_id = compra.caderno_id
+    with transaction.atomic():
+        Compra.objects.select_for_update().get(pk=compra.pk).delete()
+    if caderno_id:
+        return redirect("financeiro_caderno_detail", pk=caderno_id)
+    return redirect("financeiro")
+
+
+def _compra_detail_update_compra(request, compra, cliente):
+    nome = request.POST.get("nome", "").strip()
+    descricao = request.POST.get("descricao", "").strip()
+    categoria_id = request.POST.get("categoria")
+    centro_id = request.POST.get("centro_custo")
+    caderno_id = request.POST.get("caderno")
+    data_raw = request.POST.get("data", "").strip()
+    anexo_foto = request.FILES.get("anexo_foto")
+    remove_anexo_foto = request.POST.get("remove_anexo_foto") == "on"
+    if caderno_id and caderno_id not in _financeiro_allowed_caderno_ids(request.user, cliente):
+        return redirect("financeiro_compra_detail", pk=compra.pk)
+    if data_raw:
+        try:
+            data = datetime.strptime(data_raw, "%Y-%m-%d").date()
+        except ValueError:
+            data = None
+    else:
+        data = None
+    with transaction.atomic():
+        compra = Compra.objects.select_for_update().get(pk=compra.pk)
+        compra.nome = nome
+        compra.descricao = descricao
+        compra.categoria_id = categoria_id or None
+        compra.centro_custo_id = centro_id or None
+        compra.data = data
+        if caderno_id:
+            compra.caderno_id = caderno_id
+        update_fields = ["nome", "descricao", "categoria", "centro_custo", "caderno", "data"]
+        if remove_anexo_foto:
+            compra.anexo_foto = None
+            update_fields.append("anexo_foto")
+        elif anexo_foto:
+            compra.anexo_foto = anexo_foto
+            update_fields.append("anexo_foto")
+        compra.save(update_fields=update_fields)
+    return redirect("financeiro_compra_detail", pk=compra.pk)
+
+
+def _compra_detail_copy_next_months(request, compra, cliente):
+    meses_raw = request.POST.get("meses", "").strip()
+    try:
+        meses = int(meses_raw)
+    except (TypeError, ValueError):
+        meses = 0
+    meses = max(0, min(24, meses))
+    if meses <= 0:
+        msg = "Informe a quantidade de meses para copiar."
+        params = {"msg": msg, "level": "error"}
+        return _compra_detail_redirect(compra, params)
+    if not compra.data:
+        msg = "Defina uma data para copiar para os proximos meses."
+        params = {"msg": msg, "level": "error"}
+        return _compra_detail_redirect(compra, params)
+    with transaction.atomic():
+        compra = Compra.objects.select_for_update().get(pk=compra.pk)
+        # A parcela de cada item e interpretada uma vez; no laco dos meses sobra so a comparacao.
+        itens_origem = [(item, _parcela_copy_base(item.parcela)) for item in compra.itens.all()]
+        itens_by_date = {}
+        skipped_months = 0
+        for offset in range(1, meses + 1):
+            itens_payload = []
+            for item, parcela_base in itens_origem:
+                parcela = _shift_parcela(parcela_base, offset)
+                if not parcela:
+                    continue
+                itens_payload.append(
                     {
-                        "ok": bool(nome),
-                        "created": created,
-                        "id": centro.id if nome and "centro" in locals() else None,
-                        "nome": centro.nome if nome and "centro" in locals() else None,
-                        "message": msg,
-                        "level": level,
+                        "nome": item.nome,
+                        "valor": item.valor,
+                        "quantidade": item.quantidade,
+                        "tipo_id": item.tipo_id,
+                        "parcela": parcela,
                     }
                 )
-            params = {"cadastro": "centro", "msg": msg, "level": level}
-            return redirect(f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}")
-        if action == "delete_compra":
-            caderno_id = compra.caderno_id
-            compra.delete()
-            if caderno_id:
-                return redirect("financeiro_caderno_detail", pk=caderno_id)
-            return redirect("financeiro")
-        if action == "update_compra":
-            nome = request.POST.get("nome", "").strip()
-            descricao = request.POST.get("descricao", "").strip()
-            categoria_id = request.POST.get("categoria")
-            centro_id = request.POST.get("centro_custo")
-            caderno_id = request.POST.get("caderno")
-            data_raw = request.POST.get("data", "").strip()
-            anexo_foto = request.FILES.get("anexo_foto")
-            remove_anexo_foto = request.POST.get("remove_anexo_foto") == "on"
-            allowed_cadernos = _financeiro_allowed_cadernos_qs(request.user, cliente)
-            if caderno_id and not allowed_cadernos.filter(id=caderno_id).exists():
-                return redirect("financeiro_compra_detail", pk=compra.pk)
-            if data_raw:
-                try:
-                    data = datetime.strptime(data_raw, "%Y-%m-%d").date()
-                except ValueError:
-                    data = None
+            if not itens_payload:
+                skipped_months += 1
+                continue
+            itens_by_date[_add_months(compra.data, offset)] = itens_payload
+        existing_by_date = {}
+        for existing in Compra.objects.filter(
+            caderno_id=compra.caderno_id,
+            nome=compra.nome,
+            categoria_id=compra.categoria_id,
+            centro_custo_id=compra.centro_custo_id,
+            valor=compra.valor,
+            data__in=list(itens_by_date),
+        ).order_by("id"):
+            existing_by_date.setdefault(existing.data, existing)
+        anexo_foto_name = compra.anexo_foto.name if compra.anexo_foto else None
+        alvos_existentes = []
+        alvos_novos = []
+        for target_date in itens_by_date:
+            existing = existing_by_date.get(target_date)
+            if existing:
+                existing.descricao = compra.descricao
+                existing.valor = compra.valor
+                existing.caderno_id = compra.caderno_id
+                existing.categoria_id = compra.categoria_id
+                existing.centro_custo_id = compra.centro_custo_id
+                existing.anexo_foto = anexo_foto_name
+                alvos_existentes.append(existing)
             else:
-                data = None
-            compra.nome = nome
-            compra.descricao = descricao
-            compra.categoria_id = categoria_id or None
-            compra.centro_custo_id = centro_id or None
-            compra.data = data
-            if caderno_id:
-                compra.caderno_id = caderno_id
-            update_fields = ["nome", "descricao", "categoria", "centro_custo", "caderno", "data"]
-            if remove_anexo_foto:
-                compra.anexo_foto = None
-                update_fields.append("anexo_foto")
-            elif anexo_foto:
-                compra.anexo_foto = anexo_foto
-                update_fields.append("anexo_foto")
-            compra.save(update_fields=update_fields)
-            return redirect("financeiro_compra_detail", pk=compra.pk)
-        if action == "copy_next_months":
-            meses_raw = request.POST.get("meses", "").strip()
-            try:
-                meses = int(meses_raw)
-            except (TypeError, ValueError):
-                meses = 0
-            meses = max(0, min(24, meses))
-            if meses <= 0:
-                msg = "Informe a quantidade de meses para copiar."
-                params = {"msg": msg, "level": "error"}
-                return redirect(
-                    f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}"
-                )
-            if not compra.data:
-                msg = "Defina uma data para copiar para os proximos meses."
-                params = {"msg": msg, "level": "error"}
-                return redirect(
-                    f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}"
-                )
-            itens_origem = list(compra.itens.all())
-            copied_months = 0
-            skipped_months = 0
-            for offset in range(1, meses + 1):
-                target_date = _add_months(compra.data, offset)
-                itens_payload = []
-                for item in itens_origem:
-                    parcela = _parcela_for_copy(item.parcela, offset)
-                    if not parcela:
-                        continue
-                    itens_payload.append(
-                        {
-                            "nome": item.nome,
-                            "valor": item.valor,
-                            "quantidade": item.quantidade,
-                            "tipo_id": item.tipo_id,
-                            "parcela": parcela,
-                        }
-                    )
-                if not itens_payload:
-                    skipped_months += 1
-                    continue
-                existing = Compra.objects.filter(
-                    caderno_id=compra.caderno_id,
-                    nome=compra.nome,
-                    categoria_id=compra.categoria_id,
-                    centro_custo_id=compra.centro_custo_id,
-                    valor=compra.valor,
-                    data=target_date,
-                ).first()
-                if existing:
-                    existing.descricao = compra.descricao
-                    existing.valor = compra.valor
-                    existing.caderno_id = compra.caderno_id
-                    existing.categoria_id = compra.categoria_id
-                    existing.centro_custo_id = compra.centro_custo_id
-                    existing.data = target_date
-                    existing.anexo_foto = compra.anexo_foto.name if compra.anexo_foto else None
-                    existing.save(
-                        update_fields=[
-                            "descricao",
-                            "valor",
-                            "caderno",
-                            "categoria",
-                            "centro_custo",
-                            "data",
-                            "anexo_foto",
-                        ]
-                    )
-                    existing.itens.all().delete()
-                    alvo = existing
-                else:
-                    alvo = Compra.objects.create(
+                alvos_novos.append(
+                    Compra(
                         caderno_id=compra.caderno_id,
                         nome=compra.nome,
                         descricao=compra.descricao,
@@ -10104,9 +10167,34 @@ def financeiro_compra_detail(request, pk):
                         data=target_date,
                         categoria_id=compra.categoria_id,
                         centro_custo_id=compra.centro_custo_id,
-                        anexo_foto=compra.anexo_foto.name if compra.anexo_foto else None,
+                        anexo_foto=anexo_foto_name,
                     )
-                itens_novos = [
+                )
+        # Itens das copias existentes sao reaproveitados por (nome, parcela) em vez de apagar e recriar tudo.
+        itens_existentes = {}
+        if alvos_existentes:
+            Compra.objects.bulk_update(
+                alvos_existentes,
+                ["descricao", "valor", "caderno", "categoria", "centro_custo", "anexo_foto"],
+            )
+            for item in CompraItem.objects.filter(compra__in=alvos_existentes).order_by("id"):
+                itens_existentes.setdefault((item.compra_id, item.nome, item.parcela), []).append(item)
+        if alvos_novos:
+            Compra.objects.bulk_create(alvos_novos)
+        itens_atualizados = []
+        itens_novos = []
+        for alvo in alvos_existentes + alvos_novos:
+            for payload in itens_by_date[alvo.data]:
+                reaproveitaveis = itens_existentes.get((alvo.pk, payload["nome"], payload["parcela"]))
+                if reaproveitaveis:
+                    item = reaproveitaveis.pop(0)
+                    item.valor = payload["valor"]
+                    item.quantidade = payload["quantidade"]
+                    item.tipo_id = payload["tipo_id"]
+                    item.pago = False
+                    itens_atualizados.append(item)
+                    continue
+                itens_novos.append(
                     CompraItem(
                         compra=alvo,
                         nome=payload["nome"],
@@ -10116,154 +10204,198 @@ def financeiro_compra_detail(request, pk):
                         parcela=payload["parcela"],
                         pago=False,
                     )
-                    for payload in itens_payload
-                ]
-                CompraItem.objects.bulk_create(itens_novos)
-                copied_months += 1
-            if copied_months == 0:
-                msg = "Nenhuma compra copiada: itens com parcela 1/1 ou parcelas finalizadas."
-                params = {"msg": msg, "level": "warning"}
-            elif skipped_months:
-                msg = f"Compras copiadas. {skipped_months} mes(es) sem itens para copiar."
-                params = {"msg": msg, "level": "warning"}
-            else:
-                msg = "Compra copiada para os proximos meses."
-                params = {"msg": msg, "level": "success"}
-            return redirect(
-                f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}"
-            )
-        if action == "add_item":
-            nome = request.POST.get("nome", "").strip()
-            valor_raw = request.POST.get("valor", "").replace(",", ".").strip()
-            quantidade_raw = request.POST.get("quantidade", "").strip()
-            parcela_raw = request.POST.get("parcela", "")
-            tipo_id = request.POST.get("tipo")
-            pago = request.POST.get("pago") == "on"
-            try:
-                valor = Decimal(valor_raw)
-            except (InvalidOperation, ValueError):
-                valor = None
-            try:
-                quantidade = int(quantidade_raw) if quantidade_raw else 1
-            except ValueError:
-                quantidade = 1
-            quantidade = max(1, quantidade)
-            if parcela_raw and not _is_parcela_valid(parcela_raw):
-                msg = "Parcela invalida. Use 01/36 ou 1/-."
-                params = {"msg": msg, "level": "error"}
-                return redirect(
-                    f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}"
-                )
-            if nome:
-                parcela = _normalize_parcela(parcela_raw, "1/1")
-                CompraItem.objects.create(
-                    compra=compra,
-                    nome=nome,
-                    valor=valor,
-                    quantidade=quantidade,
-                    parcela=parcela,
-                    tipo_id=tipo_id or None,
-                    pago=pago,
-                )
-            return redirect("financeiro_compra_detail", pk=compra.pk)
-        if action == "toggle_item_pago":
-            item_id = request.POST.get("item_id")
-            item = get_object_or_404(CompraItem.objects.select_related("tipo"), pk=item_id, compra=compra)
-            item.pago = not item.pago
-            item.save(update_fields=["pago"])
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
-                return JsonResponse(
-                    {
-                        "ok": True,
-                        "row": serialize_item_payload(item),
-                        "compra": serialize_compra_summary(compra),
-                        "message": "Status do item atualizado.",
-                        "level": "success",
-                    }
-                )
-            return redirect("financeiro_compra_detail", pk=compra.pk)
-        if action == "update_item_valor":
-            item_id = request.POST.get("item_id")
-            item = get_object_or_404(CompraItem.objects.select_related("tipo"), pk=item_id, compra=compra)
-            valor_raw = request.POST.get("valor", "").replace(",", ".").strip()
-            try:
-                valor = Decimal(valor_raw) if valor_raw else None
-            except (InvalidOperation, ValueError):
-                if request.headers.get("x-requested-with") == "XMLHttpRequest":
-                    return JsonResponse(
-                        {
-                            "ok": False,
-                            "message": "Informe um valor valido.",
-                            "level": "error",
-                        },
-                        status=400,
-                    )
-                params = {"msg": "Informe um valor valido.", "level": "error"}
-                return redirect(
-                    f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}"
-                )
-            item.valor = valor
-            item.save(update_fields=["valor"])
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
-                return JsonResponse(
-                    {
-                        "ok": True,
-                        "row": serialize_item_payload(item),
-                        "compra": serialize_compra_summary(compra),
-                        "message": "Valor do item atualizado.",
-                        "level": "success",
-                    }
                 )
-            return redirect("financeiro_compra_detail", pk=compra.pk)
-        if action == "update_item":
-            item_id = request.POST.get("item_id")
-            item = get_object_or_404(CompraItem, pk=item_id, compra=compra)
-            nome = request.POST.get("nome", "").strip()
-            valor_raw = request.POST.get("valor", "").replace(",", ".").strip()
-            quantidade_raw = request.POST.get("quantidade", "").strip()
-            parcela_raw = request.POST.get("parcela", "")
-            tipo_id = request.POST.get("tipo")
-            pago = request.POST.get("pago") == "on"
-            try:
-                valor = Decimal(valor_raw)
-            except (InvalidOperation, ValueError):
-                valor = None
-            try:
-                quantidade = int(quantidade_raw) if quantidade_raw else item.quantidade
-            except ValueError:
-                quantidade = item.quantidade
-            quantidade = max(1, quantidade)
-            if parcela_raw and not _is_parcela_valid(parcela_raw):
-                msg = "Parcela invalida. Use 01/36 ou 1/-."
-                params = {"msg": msg, "level": "error"}
-                return redirect(
-                    f"{reverse('financeiro_compra_detail', kwargs={'pk': compra.pk})}?{urlencode(params)}"
-                )
-            if nome:
-                item.nome = nome
-            item.valor = valor
-            item.quantidade = quantidade
-            item.parcela = _normalize_parcela(parcela_raw, item.parcela)
-            item.tipo_id = tipo_id or None
-            item.pago = pago
-            item.save(update_fields=["nome", "valor", "quantidade", "parcela", "tipo", "pago"])
-            return redirect("financeiro_compra_detail", pk=compra.pk)
-        if action == "delete_item":
-            item_id = request.POST.get("item_id")
-            item = get_object_or_404(CompraItem, pk=item_id, compra=compra)
-            item.delete()
-            return redirect("financeiro_compra_detail", pk=compra.pk)
+        sobras = [item.pk for restantes in itens_existentes.values() for item in restantes]
+        if sobras:
+            CompraItem.objects.filter(pk__in=sobras).delete()
+        if itens_atualizados:
+            CompraItem.objects.bulk_update(itens_atualizados, ["valor", "quantidade", "tipo", "pago"], batch_size=500)
+        CompraItem.objects.bulk_create(itens_novos, batch_size=500)
+        copied_months = len(itens_by_date)
+    if copied_months == 0:
+        msg = "Nenhuma compra copiada: itens com parcela 1/1 ou parcelas finalizadas."
+        params = {"msg": msg, "level": "warning"}
+    elif skipped_months:
+        msg = f"Compras copiadas. {skipped_months} mes(es) sem itens para copiar."
+        params = {"msg": msg, "level": "warning"}
+    else:
+        msg = "Compra copiada para os proximos meses."
+        params = {"msg": msg, "level": "success"}
+    return _compra_detail_redirect(compra, params)
+
+
+def _compra_detail_add_item(request, compra, cliente):
+    nome = request.POST.get("nome", "").strip()
+    quantidade_raw = request.POST.get("quantidade", "").strip()
+    parcela_raw = request.POST.get("parcela", "")
+    tipo_id = request.POST.get("tipo")
+    pago = request.POST.get("pago") == "on"
+    try:
+        valor = _parse_valor(request.POST.get("valor"))
+    except (InvalidOperation, ValueError):
+        valor = None
+    try:
+        quantidade = int(quantidade_raw) if quantidade_raw else 1
+    except ValueError:
+        quantidade = 1
+    quantidade = max(1, quantidade)
+    if parcela_raw and not _is_parcela_valid(parcela_raw):
+        msg = "Parcela invalida. Use 01/36 ou 1/-."
+        params = {"msg": msg, "level": "error"}
+        return _compra_detail_redirect(compra, params)
+    if nome:
+        parcela = _normalize_parcela(parcela_raw, "1/1")
+        CompraItem.objects.create(
+            compra=compra,
+            nome=nome,
+            valor=valor,
+            quantidade=quantidade,
+            parcela=parcela,
+            tipo_id=tipo_id or None,
+            pago=pago,
+        )
+    return redirect("financeiro_compra_detail", pk=compra.pk)
+
+
+def _compra_detail_toggle_item_pago(request, compra, cliente):
+    item_id = request.POST.get("item_id")
+    item = get_object_or_404(CompraItem.objects.select_related("tipo"), pk=item_id, compra=compra)
+    item.pago = not item.pago
+    item.save(update_fields=["pago"])
+    if _is_ajax_request(request):
+        return JsonResponse(
+            {
+                "ok": True,
+                "row": _compra_item_payload(item),
+                "compra": _compra_summary_payload(compra),
+                "message": "Status do item atualizado.",
+                "level": "success",
+            }
+        )
+    return redirect("financeiro_compra_detail", pk=compra.pk)
+
+
+def _compra_detail_update_item_valor(request, compra, cliente):
+    item_id = request.POST.get("item_id")
+    item = get_object_or_404(CompraItem.objects.select_related("tipo"), pk=item_id, compra=compra)
+    try:
+        valor = _parse_valor(request.POST.get("valor"))
+    except (InvalidOperation, ValueError):
+        if _is_ajax_request(request):
+            return JsonResponse(
+                {
+                    "ok": False,
+                    "message": "Informe um valor valido.",
+                    "level": "error",
+                },
+                status=400,
+            )
+        params = {"msg": "Informe um valor valido.", "level": "error"}
+        return _compra_detail_redirect(compra, params)
+    item.valor = valor
+    item.save(update_fields=["valor"])
+    if _is_ajax_request(request):
+        return JsonResponse(
+            {
+                "ok": True,
+                "row": _compra_item_payload(item),
+                "compra": _compra_summary_payload(compra),
+                "message": "Valor do item atualizado.",
+                "level": "success",
+            }
+        )
+    return redirect("financeiro_compra_detail", pk=compra.pk)
+
+
+def _compra_detail_update_item(request, compra, cliente):
+    item_id = request.POST.get("item_id")
+    item = get_object_or_404(CompraItem, pk=item_id, compra=compra)
+    nome = request.POST.get("nome", "").strip()
+    quantidade_raw = request.POST.get("quantidade", "").strip()
+    parcela_raw = request.POST.get("parcela", "")
+    tipo_id = request.POST.get("tipo")
+    pago = request.POST.get("pago") == "on"
+    try:
+        valor = _parse_valor(request.POST.get("valor"))
+    except (InvalidOperation, ValueError):
+        valor = None
+    try:
+        quantidade = int(quantidade_raw) if quantidade_raw else item.quantidade
+    except ValueError:
+        quantidade = item.quantidade
+    quantidade = max(1, quantidade)
+    if parcela_raw and not _is_parcela_valid(parcela_raw):
+        msg = "Parcela invalida. Use 01/36 ou 1/-."
+        params = {"msg": msg, "level": "error"}
+        return _compra_detail_redirect(compra, params)
+    if nome:
+        item.nome = nome
+    item.valor = valor
+    item.quantidade = quantidade
+    item.parcela = _normalize_parcela(parcela_raw, item.parcela)
+    item.tipo_id = tipo_id or None
+    item.pago = pago
+    item.save(update_fields=["nome", "valor", "quantidade", "parcela", "tipo", "pago"])
+    return redirect("financeiro_compra_detail", pk=compra.pk)
+
+
+def _compra_detail_delete_item(request, compra, cliente):
+    item_id = request.POST.get("item_id")
+    item = get_object_or_404(CompraItem, pk=item_id, compra=compra)
+    item.delete()
+    return redirect("financeiro_compra_detail", pk=compra.pk)
+
+
+_COMPRA_DETAIL_ACTIONS = {
+    "create_categoria": _compra_detail_create_categoria,
+    "create_centro": _compra_detail_create_centro,
+    "delete_compra": _compra_detail_delete_compra,
+    "update_compra": _compra_detail_update_compra,
+    "copy_next_months": _compra_detail_copy_next_months,
+    "add_item": _compra_detail_add_item,
+    "toggle_item_pago": _compra_detail_toggle_item_pago,
+    "update_item_valor": _compra_detail_update_item_valor,
+    "update_item": _compra_detail_update_item,
+    "delete_item": _compra_detail_delete_item,
+}
+
+
+@login_required
+def financeiro_compra_detail(request, pk):
+    denied_response = _require_internal_module_access(request, "FINANCEIRO")
+    if denied_response:
+        return denied_response
+    cliente = _get_cliente(request.user)
+    if not cliente and not _is_admin_user(request.user):
+        return HttpResponseForbidden("Sem cadastro de cliente.")
+    compra = _financeiro_get_compra_or_404(request.user, cliente, pk)
+    message = request.GET.get("msg", "").strip()
+    message_level = request.GET.get("level", "").strip() or "info"
+    open_cadastro = request.GET.get("cadastro", "").strip()
+    if request.method == "POST":
+        handler = _COMPRA_DETAIL_ACTIONS.get(request.POST.get("action"))
+        if handler:
+            return handler(request, compra, cliente)
+    itens_qs = (
+        CompraItem.objects.select_related("tipo")
+        .only("id", "compra_id", "nome", "valor", "quantidade", "parcela", "pago", "tipo__nome")
+        .annotate(
+            total_valor=ExpressionWrapper(
+                Coalesce(F("valor"), Value(_ZERO_MONEY)) * F("quantidade"),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            )
+        )
+        .order_by("id")
+    )
+    prefetch_related_objects([compra], Prefetch("itens", queryset=itens_qs))
+    itens = list(compra.itens.all())
     compra.status_label = _compra_status_label(compra)
-    itens = list(compra.itens.select_related("tipo").order_by("id"))
-    itens_table_data = []
-    for item in itens:
-        item.total_valor = (item.valor or 0) * (item.quantidade or 0)
-        itens_table_data.append(serialize_item_payload(item))
-    compra.total_itens = sum(item.total_valor for item in itens)
-    tipos = TipoCompra.objects.order_by("nome")
-    categorias = CategoriaCompra.objects.order_by("nome")
-    centros = CentroCusto.objects.order_by("nome")
-    cadernos = _financeiro_allowed_cadernos_qs(request.user, cliente).order_by("nome")
+    itens_table_data = [_compra_item_payload(item) for item in itens]
+    compra.total_itens = sum((item.total_valor for item in itens), _ZERO_MONEY)
+    tipos = financeiro_options(request, TipoCompra)
+    categorias = financeiro_options(request, CategoriaCompra)
+    centros = financeiro_options(request, CentroCusto)
+    cadernos = _financeiro_allowed_cadernos_qs(request.user, cliente).only("id", "nome").order_by("nome")
     return render(
         request,
         "core/financeiro_compra_detail.html",
@@ -10282,17 +10414,18 @@ def financeiro_compra_detail(request, pk):
     )
 
 
-@login_required
+@never_cache
+@staff_member_required
 def admin_explorar(request):
-    if not _is_admin_user(request.user):
-        return HttpResponseForbidden("Sem permissao.")
     cliente_id = request.GET.get("cliente_id")
     cliente_q = request.GET.get("cliente_q", "").strip()
     cliente_sort = request.GET.get("cliente_sort", "nome")
     proposta_status = request.GET.get("proposta_status", "").strip()
     proposta_sort = request.GET.get("proposta_sort", "-criado_em")
 
-    clientes = PerfilUsuario.objects.all()
+    clientes = PerfilUsuario.objects.only("id", "nome", "empresa", "email").annotate(
+        propostas_total=Count("propostas")
+    )
     if cliente_q:
         clientes = clientes.filter(nome__icontains=cliente_q)
     if cliente_sort == "empresa":
@@ -10301,12 +10434,15 @@ def admin_explorar(request):
         clientes = clientes.order_by("email", "nome")
     else:
         clientes = clientes.order_by("nome")
+    clientes = Paginator(clientes, 25).get_page(request.GET.get("page"))
 
     cliente = None
     propostas = Proposta.objects.none()
     if cliente_id:
-        cliente = get_object_or_404(PerfilUsuario, pk=cliente_id)
-        propostas = Proposta.objects.filter(cliente=cliente)
+        cliente = get_object_or_404(PerfilUsuario.objects.only("id", "nome"), pk=cliente_id)
+        propostas = Proposta.objects.filter(cliente=cliente).only(
+            "id", "nome", "codigo", "aprovada", "finalizada", "prioridade", "valor", "criado_em"
+        )
         if proposta_status == "pendente":
             propostas = propostas.filter(aprovada__isnull=True)
         elif proposta_status == "aprovada":
@@ -10321,6 +10457,7 @@ def admin_explorar(request):
             propostas = propostas.order_by("-valor", "-criado_em")
         else:
             propostas = propostas.order_by("-criado_em")
+        propostas = Paginator(propostas, 50).get_page(request.GET.get("ppage"))
     return render(
         request,
         "admin/explorar.html",
@@ -10365,7 +10502,7 @@ def modulos_acesso_gerenciar(request):
         {
             "core_modules": core_modules,
             "app_modules": app_modules,
-            "tipos": TipoPerfil.objects.order_by("nome"),
+            "tipos": tipos_perfil_options(request),
             "message": message,
         },
     )
@@ -11072,10 +11209,8 @@ def ajustes_sistema(request):
                 )
         if action == "toggle_tipo_ativo":
             tipo_id = request.POST.get("tipo_id")
-            tipo = TipoAtivo.objects.filter(pk=tipo_id).first()
-            if tipo:
-                tipo.ativo = not tipo.ativo
-                tipo.save(update_fields=["ativo"])
+            if tipo_id:
+                TipoAtivo.objects.filter(pk=tipo_id).update(ativo=~F("ativo"))
         if action == "update_maintenance_mode":
             system_config.maintenance_mode_enabled = request.POST.get("maintenance_mode_enabled") == "on"
             system_config.maintenance_message = request.POST.get("maintenance_message", "").strip()
@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.urls import reverse
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'saasset.settings')
 
 application = get_asgi_application()
+
+# Aquece o resolver no boot do worker: o primeiro reverse() importa o URLconf e
+# compila todas as rotas, custo que antes caia na primeira requisicao.
+reverse("home")
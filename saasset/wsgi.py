@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'saasset.settings')
 
 application = get_wsgi_application()
+
+# Aquece o resolver no boot do worker: o primeiro reverse() importa o URLconf e
+# compila todas as rotas, custo que antes caia na primeira requisicao.
+reverse("home")